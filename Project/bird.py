@@ -1,4 +1,7 @@
-import pygame
+# Size of the bird's hitbox. bird.png (820x512) is wider than the screen, so
+# the viewer scales it down to this size, keeping its aspect ratio.
+BIRD_WIDTH = 40
+BIRD_HEIGHT = 25
 
 class Bird:
     def __init__(self, x, y):
@@ -7,26 +10,25 @@ class Bird:
         self.velocity = 0
         self.gravity = 1
         self.lift = -15
-        self.bird_img = pygame.image.load("bird.png") # Replace with your bird image file
-        print("Bird image loaded successfully")
+        self.width = BIRD_WIDTH
+        self.height = BIRD_HEIGHT
 
     def update(self):
         # Apply gravity
         self.velocity += self.gravity
         self.y += self.velocity
 
-    def draw(self, screen):
-        print("Drawing Bird")
-        screen.blit(self.bird_img, (self.x, self.y))
-
     def jump(self):
         self.velocity = self.lift
 
     def get_rect(self):
-        # Return the bounding rectangle of the bird image
-        return pygame.Rect(self.x, self.y, self.bird_img.get_width(), self.bird_img.get_height())
+        # Return the bounding rectangle of the bird as (x, y, width, height)
+        return (self.x, self.y, self.width, self.height)
 
     def collides(self, pipe):
-        # Check for collision between bird and pipe
-        bird_rect = self.get_rect()
-        return bird_rect.colliderect(pipe.pipe_top) or bird_rect.colliderect(pipe.pipe_bottom)
+        # Check for collision between bird and pipe, with the same overlap
+        # test as pygame.Rect.colliderect. The top pipe reaches past the top
+        # of the screen, so the bird cannot fly over it.
+        if self.x >= pipe.x + pipe.PIPE_WIDTH or pipe.x >= self.x + self.width:
+            return False
+        return self.y < pipe.top_height or self.y + self.height > pipe.top_height + pipe.PIPE_GAP
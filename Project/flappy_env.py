@@ -0,0 +1,112 @@
+import argparse
+import random
+import time
+import numpy as np
+from bird import Bird
+from pipe import Pipe
+
+# Constants
+SCREEN_WIDTH = 500
+SCREEN_HEIGHT = 800
+FPS = 60
+GROUND_HEIGHT = 100
+# A new pipe comes in once the last one is this far from the right edge
+PIPE_SPACING = 200
+
+# Rewards: every frame survived, every pipe passed and dying
+REWARD_ALIVE = 0.1
+REWARD_PIPE = 1.0
+REWARD_DEATH = -1.0
+
+class FlappyEnv:
+    # The game of main.py without a display: one call to step() is one frame,
+    # simulated as fast as the CPU allows. action is 1 to jump and 0 to do
+    # nothing. step() returns (observation, reward, done, info) like a gym
+    # environment, where the observation is
+    #   [bird y, bird velocity, next pipe x - bird x, next pipe top height]
+    # and the next pipe is the first one the bird has not yet passed.
+    def __init__(self, seed=None, max_frames=None):
+        self.rng = random.Random(seed)
+        self.max_frames = max_frames
+        self.reset()
+
+    def reset(self, seed=None):
+        if seed is not None:
+            self.rng.seed(seed)
+        self.bird = Bird(SCREEN_WIDTH // 4, SCREEN_HEIGHT // 2)
+        # The first pipe, which main.py creates on the first frame
+        self.pipes = [Pipe(SCREEN_WIDTH, SCREEN_HEIGHT, rng=self.rng)]
+        self.frames = 0
+        self.score = 0
+        self.done = False
+        return self.observation()
+
+    def next_pipe(self):
+        for pipe in self.pipes:
+            if pipe.x + pipe.PIPE_WIDTH > self.bird.x:
+                return pipe
+        return self.pipes[-1]
+
+    def observation(self):
+        bird = self.bird
+        pipe = self.next_pipe()
+        return np.array([bird.y, bird.velocity, pipe.x - bird.x, pipe.top_height], dtype=float)
+
+    def step(self, action):
+        if self.done:
+            raise RuntimeError("the episode is over, call reset() first")
+        bird = self.bird
+        if action:
+            bird.jump()
+        bird.update()
+
+        # Pipe generation and update
+        if self.pipes[-1].x < SCREEN_WIDTH - PIPE_SPACING:
+            self.pipes.append(Pipe(SCREEN_WIDTH, SCREEN_HEIGHT, rng=self.rng))
+        for pipe in self.pipes:
+            pipe.update()
+
+        # Remove off-screen pipes
+        self.pipes = [pipe for pipe in self.pipes if pipe.x > -pipe.PIPE_WIDTH]
+        self.frames += 1
+
+        reward = REWARD_ALIVE
+        for pipe in self.pipes:
+            if not pipe.passed and pipe.x + pipe.PIPE_WIDTH <= bird.x:
+                pipe.passed = True
+                self.score += 1
+                reward += REWARD_PIPE
+
+        # Check for collisions with pipes or ground
+        if any(bird.collides(pipe) for pipe in self.pipes) or bird.y > SCREEN_HEIGHT - GROUND_HEIGHT:
+            reward = REWARD_DEATH
+            self.done = True
+        truncated = not self.done and self.max_frames is not None and self.frames >= self.max_frames
+        self.done = self.done or truncated
+
+        info = {"score": self.score, "frames": self.frames, "truncated": truncated}
+        return self.observation(), reward, self.done, info
+
+def main():
+    # Frames per second of the headless game under a random policy
+    parser = argparse.ArgumentParser(description="Headless Flappy Bird speed test")
+    parser.add_argument("--frames", type=int, default=200000, help="Frames to simulate")
+    parser.add_argument("--jump", type=float, default=0.05, help="Probability of jumping in a frame")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    env = FlappyEnv(seed=args.seed)
+    rng = random.Random(args.seed)
+    episodes = 0
+    start = time.perf_counter()
+    for _ in range(args.frames):
+        _, _, done, _ = env.step(rng.random() < args.jump)
+        if done:
+            env.reset()
+            episodes += 1
+    seconds = time.perf_counter() - start
+    print(f"{args.frames} frames, {episodes} episodes in {seconds:.3f} s: "
+          f"{args.frames / seconds:,.0f} frames/s ({args.frames / seconds / FPS:,.0f}x real time)")
+
+if __name__ == "__main__":
+    main()
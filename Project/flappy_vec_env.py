@@ -0,0 +1,142 @@
+import argparse
+import random
+import time
+import numpy as np
+from bird import Bird
+from pipe import Pipe
+from flappy_env import SCREEN_WIDTH, SCREEN_HEIGHT, GROUND_HEIGHT, PIPE_SPACING, \
+    REWARD_ALIVE, REWARD_PIPE, REWARD_DEATH
+
+# x of ring buffer slots without a pipe: far enough left that they never
+# collide, score or count as the next pipe
+NO_PIPE = -(1 << 30)
+
+class FlappyVecEnv:
+    # num_envs copies of FlappyEnv stepped in lockstep. The state of all games
+    # is held in arrays: the bird's y and velocity per game, and the x and top
+    # height of its pipes in a ring buffer of `capacity` slots per game, where
+    # tail is the slot of the newest pipe. Each step() is a fixed number of
+    # array operations whatever num_envs is. A game that ends is reset in the
+    # same step, so the returned observation of a done game is the first one
+    # of its next episode; info holds the score and frames of the episode that
+    # ended.
+    def __init__(self, num_envs, seed=None, max_frames=None, capacity=4):
+        # Game constants, read off a bird and a pipe so that they match
+        # bird.py and pipe.py
+        bird = Bird(SCREEN_WIDTH // 4, SCREEN_HEIGHT // 2)
+        pipe = Pipe(SCREEN_WIDTH, SCREEN_HEIGHT, rng=random.Random(0))
+        self.bird_x, self.start_y = bird.x, bird.y
+        self.bird_width, self.bird_height = bird.width, bird.height
+        self.gravity, self.lift = bird.gravity, bird.lift
+        self.pipe_width, self.pipe_gap, self.pipe_speed = pipe.PIPE_WIDTH, pipe.PIPE_GAP, pipe.PIPE_SPEED
+        # A pipe lives until it is pipe_width left of the screen and a new one
+        # comes every PIPE_SPACING pixels, so the ring buffer must hold that
+        # many pipes
+        if capacity * PIPE_SPACING < SCREEN_WIDTH + pipe.PIPE_WIDTH:
+            raise ValueError(f"capacity {capacity} is too small to hold every pipe on screen")
+
+        self.num_envs = num_envs
+        self.max_frames = max_frames
+        self.rng = np.random.default_rng(seed)
+        self.envs = np.arange(num_envs)
+        self.bird_y = np.empty(num_envs, dtype=np.int32)
+        self.velocity = np.empty(num_envs, dtype=np.int32)
+        self.pipe_x = np.empty((num_envs, capacity), dtype=np.int32)
+        self.pipe_top = np.empty((num_envs, capacity), dtype=np.int32)
+        self.tail = np.empty(num_envs, dtype=np.int64)
+        self.frames = np.empty(num_envs, dtype=np.int64)
+        self.score = np.empty(num_envs, dtype=np.int64)
+        self.reset()
+
+    def reset(self):
+        self.reset_envs(self.envs)
+        return self.observation()
+
+    def reset_envs(self, envs):
+        self.bird_y[envs] = self.start_y
+        self.velocity[envs] = 0
+        self.pipe_x[envs] = NO_PIPE
+        # The first pipe goes in slot 0
+        self.tail[envs] = 0
+        self.pipe_x[envs, 0] = SCREEN_WIDTH
+        self.pipe_top[envs, 0] = self.new_top_heights(len(envs))
+        self.frames[envs] = 0
+        self.score[envs] = 0
+
+    def new_top_heights(self, count):
+        # Same range as Pipe's random.randint
+        return self.rng.integers(50, SCREEN_HEIGHT - self.pipe_gap - 50, size=count, endpoint=True)
+
+    def observation(self):
+        # [bird y, bird velocity, next pipe x - bird x, next pipe top height]
+        # per game, as in FlappyEnv. With at most capacity pipes, the next
+        # pipe is the leftmost one whose right edge is past the bird.
+        ahead = self.pipe_x + self.pipe_width > self.bird_x
+        slot = np.where(ahead, self.pipe_x, np.iinfo(np.int32).max).argmin(axis=1)
+        obs = np.empty((self.num_envs, 4), dtype=np.float32)
+        obs[:, 0] = self.bird_y
+        obs[:, 1] = self.velocity
+        obs[:, 2] = self.pipe_x[self.envs, slot] - self.bird_x
+        obs[:, 3] = self.pipe_top[self.envs, slot]
+        return obs
+
+    def step(self, actions):
+        # Bird update, with actions 1 to jump and 0 not to
+        self.velocity[:] = np.where(np.asarray(actions, dtype=bool), self.lift, self.velocity) + self.gravity
+        self.bird_y += self.velocity
+
+        # Pipe generation and update
+        spawn = np.flatnonzero(self.pipe_x[self.envs, self.tail] < SCREEN_WIDTH - PIPE_SPACING)
+        if len(spawn):
+            self.tail[spawn] = (self.tail[spawn] + 1) % self.pipe_x.shape[1]
+            self.pipe_x[spawn, self.tail[spawn]] = SCREEN_WIDTH
+            self.pipe_top[spawn, self.tail[spawn]] = self.new_top_heights(len(spawn))
+        self.pipe_x -= self.pipe_speed
+        self.frames += 1
+
+        # A pipe's right edge passes the bird in exactly one frame, since it
+        # moves pipe_speed at a time
+        right = self.pipe_x + self.pipe_width
+        passed = ((right <= self.bird_x) & (right > self.bird_x - self.pipe_speed)).sum(axis=1)
+        self.score += passed
+
+        # Check for collisions with pipes or ground
+        y = self.bird_y[:, None]
+        hit = (self.bird_x < right) & (self.pipe_x < self.bird_x + self.bird_width) & \
+              ((y < self.pipe_top) | (y + self.bird_height > self.pipe_top + self.pipe_gap))
+        dead = hit.any(axis=1) | (self.bird_y > SCREEN_HEIGHT - GROUND_HEIGHT)
+        rewards = np.where(dead, REWARD_DEATH, REWARD_ALIVE + REWARD_PIPE * passed).astype(np.float32)
+        truncated = ~dead & (self.frames >= self.max_frames) if self.max_frames is not None \
+            else np.zeros(self.num_envs, dtype=bool)
+        dones = dead | truncated
+
+        info = {"score": self.score.copy(), "frames": self.frames.copy(), "truncated": truncated}
+        done_envs = np.flatnonzero(dones)
+        if len(done_envs):
+            self.reset_envs(done_envs)
+        return self.observation(), rewards, dones, info
+
+def main():
+    # Env steps per second of the batch under a random policy
+    parser = argparse.ArgumentParser(description="Vectorized Flappy Bird speed test")
+    parser.add_argument("--envs", type=int, default=4096, help="Games stepped in lockstep")
+    parser.add_argument("--steps", type=int, default=1000, help="Steps of the whole batch")
+    parser.add_argument("--jump", type=float, default=0.05, help="Probability of jumping in a frame")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    env = FlappyVecEnv(args.envs, seed=args.seed)
+    rng = np.random.default_rng(args.seed)
+    # Actions are drawn up front so that only the environment is timed
+    actions = rng.random((args.steps, args.envs)) < args.jump
+    episodes = 0
+    start = time.perf_counter()
+    for t in range(args.steps):
+        _, _, dones, _ = env.step(actions[t])
+        episodes += dones.sum()
+    seconds = time.perf_counter() - start
+    env_steps = args.steps * args.envs
+    print(f"{env_steps} env steps, {episodes} episodes in {seconds:.3f} s: {env_steps / seconds:,.0f} env steps/s")
+
+if __name__ == "__main__":
+    main()
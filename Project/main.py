@@ -1,84 +1,42 @@
 import pygame
 import sys
-from bird import Bird
-from pipe import Pipe
+from flappy_env import FlappyEnv
+from viewer import FlappyViewer
 
-pygame.init()
-
-# Constants
-SCREEN_WIDTH = 500
-SCREEN_HEIGHT = 800
-FPS = 60
-GROUND_HEIGHT = 100
-
-# Colors
-WHITE = (255, 255, 255)
-
-# Create game window
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("Flappy Bird")
-
-# Create clock object to control frame rate
-clock = pygame.time.Clock()
-
-# Create bird and pipes objects
-bird = Bird(SCREEN_WIDTH // 4, SCREEN_HEIGHT // 2)
-pipes = []
+# The game itself is simulated by FlappyEnv; this loop only reads the
+# keyboard and draws every frame with FlappyViewer at FPS frames per second
 
 def main():
-    global bird, pipes
+    env = FlappyEnv()
+    viewer = FlappyViewer()
+    viewer.draw(env)
 
     pygame.time.wait(1000)
-    
-    while True:
+
+    done = False
+    while not done:
+        jump = False
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
-                pygame.quit()
+                viewer.close()
                 sys.exit()
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_SPACE:
-                    bird.jump()
-
-        # Bird update and draw
-        bird.update()
-        bird.draw(screen)
-
-        # Pipe generation and update
-        if len(pipes) == 0 or pipes[-1].x < SCREEN_WIDTH - 200:
-            pipes.append(Pipe(SCREEN_WIDTH, SCREEN_HEIGHT))
-        for pipe in pipes:
-            pipe.update()
-            pipe.draw(screen)
-
-        # Remove off-screen pipes
-        pipes = [pipe for pipe in pipes if pipe.x > -pipe.PIPE_WIDTH]
-
-        # Draw ground
-        pygame.draw.rect(screen, (0, 255, 0), (0, SCREEN_HEIGHT - GROUND_HEIGHT, SCREEN_WIDTH, GROUND_HEIGHT))
-
-        # Check for collisions with pipes or ground
-        for pipe in pipes:
-            if bird.collides(pipe):
-                # Game Over
-                pygame.quit()
-                sys.exit()
-
-        if bird.y > SCREEN_HEIGHT - GROUND_HEIGHT:
-            # Bird hit the ground
-            pygame.quit()
-            sys.exit()
+                    jump = True
 
-        # Update display
-        pygame.display.flip()
+        _, _, done, info = env.step(jump)
+        viewer.draw(env)
+        viewer.tick()
 
-        # Control frame rate
-        clock.tick(FPS)
+    # Game Over
+    print("Score:", info["score"])
+    return viewer
 
 if __name__ == "__main__":
     print("Starting Flappy Bird Game")
-    main()
+    viewer = main()
     print("Game Loop Exited")
     # Add a delay before exiting the program
     pygame.time.wait(2000)
-    pygame.quit()
+    viewer.close()
     sys.exit()
@@ -1,20 +1,25 @@
-import pygame
 import random
 
 class Pipe:
-    def __init__(self, screen_width, screen_height):
+    def __init__(self, screen_width, screen_height, rng=random):
         self.PIPE_WIDTH = 80
         self.PIPE_GAP = 200
+        self.PIPE_SPEED = 5
+        self.screen_height = screen_height
         self.x = screen_width
-        self.top_height = random.randint(50, screen_height - self.PIPE_GAP - 50)
+        self.top_height = rng.randint(50, screen_height - self.PIPE_GAP - 50)
         self.bottom_height = screen_height - self.top_height - self.PIPE_GAP
-        self.pipe_top = pygame.Rect(self.x, 0, self.PIPE_WIDTH, self.top_height)
-        self.pipe_bottom = pygame.Rect(self.x, screen_height - self.bottom_height, self.PIPE_WIDTH, self.bottom_height)
+        # Set once the bird is past the pipe
+        self.passed = False
 
     def update(self):
-        self.x -= 5
+        self.x -= self.PIPE_SPEED
 
-    def draw(self, screen):
-        print("Drawing Pipe")
-        pygame.draw.rect(screen, (0, 0, 255), self.pipe_top)
-        pygame.draw.rect(screen, (0, 0, 255), self.pipe_bottom)
\ No newline at end of file
+    @property
+    def pipe_top(self):
+        # (x, y, width, height) of the top pipe at the current position
+        return (self.x, 0, self.PIPE_WIDTH, self.top_height)
+
+    @property
+    def pipe_bottom(self):
+        return (self.x, self.screen_height - self.bottom_height, self.PIPE_WIDTH, self.bottom_height)
@@ -0,0 +1,158 @@
+import argparse
+import os
+import random
+import time
+import numpy as np
+from flappy_env import FlappyEnv, SCREEN_WIDTH, SCREEN_HEIGHT, GROUND_HEIGHT
+from flappy_vec_env import FlappyVecEnv
+from pipe import Pipe
+
+# Tabular Q-learning on the headless game. An observation of FlappyEnv or
+# FlappyVecEnv, [bird y, bird velocity, next pipe x - bird x, next pipe top
+# height], is binned into
+#   bird y                      in bins of Y_BIN pixels
+#   bird velocity               one bin per value, clipped to VELOCITY_RANGE
+#   next pipe x - bird x        in bins of DX_BIN pixels
+#   bottom of the gap - bird y  in bins of DY_BIN pixels, clipped to DY_RANGE
+# and the bin numbers are combined into one integer state, which indexes the
+# rows of a dense (num_states, 2) Q array. Checkpoints are .npy files, so
+# np.load(path, mmap_mode="r") maps the table instead of reading it.
+
+Y_BIN = 350
+VELOCITY_RANGE = (-15, 15)
+DX_BIN, DX_RANGE = 20, (-80, 380)
+DY_BIN, DY_RANGE = 20, (-400, 400)
+PIPE_GAP = Pipe(SCREEN_WIDTH, SCREEN_HEIGHT, rng=random.Random(0)).PIPE_GAP
+
+num_actions = 2
+bins = ((SCREEN_HEIGHT - GROUND_HEIGHT) // Y_BIN + 1,
+        VELOCITY_RANGE[1] - VELOCITY_RANGE[0] + 1,
+        (DX_RANGE[1] - DX_RANGE[0]) // DX_BIN,
+        (DY_RANGE[1] - DY_RANGE[0]) // DY_BIN)
+num_states = int(np.prod(bins))
+
+def state_index(obs):
+    # Integer state of one observation, shape (4,), or of a batch, shape (n, 4)
+    obs = np.asarray(obs).astype(np.int64)
+    y, velocity, dx, top = obs[..., 0], obs[..., 1], obs[..., 2], obs[..., 3]
+    y_bin = np.clip(y, 0, SCREEN_HEIGHT - GROUND_HEIGHT) // Y_BIN
+    velocity_bin = np.clip(velocity, *VELOCITY_RANGE) - VELOCITY_RANGE[0]
+    dx_bin = (np.clip(dx, DX_RANGE[0], DX_RANGE[1] - 1) - DX_RANGE[0]) // DX_BIN
+    dy_bin = (np.clip(top + PIPE_GAP - y, DY_RANGE[0], DY_RANGE[1] - 1) - DY_RANGE[0]) // DY_BIN
+    return np.ravel_multi_index((y_bin, velocity_bin, dx_bin, dy_bin), bins)
+
+def new_q_table():
+    return np.zeros((num_states, num_actions), dtype=np.float32)
+
+def save_checkpoint(Q, path):
+    # Written to a temporary file first, so an interrupted save never
+    # leaves a half-written table behind
+    tmp = path + ".tmp.npy"
+    out = np.lib.format.open_memmap(tmp, mode="w+", dtype=Q.dtype, shape=Q.shape)
+    out[:] = Q
+    out.flush()
+    del out
+    os.replace(tmp, path)
+
+def load_checkpoint(path, mmap_mode=None):
+    Q = np.load(path, mmap_mode=mmap_mode)
+    if Q.shape != (num_states, num_actions):
+        raise ValueError(f"{path} holds a table of shape {Q.shape}, expected {(num_states, num_actions)}")
+    return Q
+
+def train(Q, num_envs, num_steps, alpha, epsilon, gamma, seed=None, checkpoint=None, checkpoint_every=0,
+          report_every=0):
+    # Q-learning over num_envs games stepped together by FlappyVecEnv, with
+    # the update of Week4's q_learning:
+    #   Q[s][a] += alpha * (reward + gamma * max(Q[s']) - Q[s][a])
+    # applied to every game at once. A game that dies has no next state, so
+    # its target is the reward alone. Games of one step that took the same
+    # action in the same state share an entry of Q: it moves once, by alpha
+    # times the mean of their TD errors, all taken against Q before the step.
+    env = FlappyVecEnv(num_envs, seed=seed)
+    rng = np.random.default_rng(seed)
+    state = state_index(env.reset())
+    scores = []
+    start = time.perf_counter()
+    for t in range(1, num_steps + 1):
+        explore = rng.random(num_envs) < epsilon
+        action = np.where(explore, rng.integers(num_actions, size=num_envs), Q[state].argmax(axis=1))
+        obs, reward, done, info = env.step(action)
+        next_state = state_index(obs)
+
+        target = reward + np.where(done, 0.0, gamma * Q[next_state].max(axis=1))
+        td_error = target - Q[state, action]
+        # Assigning to Q[state, action] would keep only one update of a
+        # repeated (state, action), so the errors are averaged per pair
+        pairs, inverse = np.unique(state * num_actions + action, return_inverse=True)
+        mean_error = np.bincount(inverse, weights=td_error) / np.bincount(inverse)
+        Q[pairs // num_actions, pairs % num_actions] += alpha * mean_error
+        state = next_state
+
+        if done.any():
+            scores.extend(info["score"][done].tolist())
+        if checkpoint and checkpoint_every and t % checkpoint_every == 0:
+            save_checkpoint(Q, checkpoint)
+        if report_every and t % report_every == 0:
+            seconds = time.perf_counter() - start
+            recent = scores[-1000:]
+            print(f"{t * num_envs:>12d} steps {len(scores):>9d} episodes "
+                  f"mean score {np.mean(recent) if recent else 0.0:7.2f} (last 1000) "
+                  f"max {max(scores) if scores else 0:5d} {t * num_envs / seconds:12,.0f} steps/s")
+    if checkpoint:
+        save_checkpoint(Q, checkpoint)
+    return scores
+
+def play(Q, episodes, seed=None, max_frames=10000, viewer=None):
+    # Greedy play on FlappyEnv, optionally drawn by a FlappyViewer
+    env = FlappyEnv(seed=seed, max_frames=max_frames)
+    scores = []
+    for _ in range(episodes):
+        obs = env.reset()
+        done = False
+        while not done:
+            obs, _, done, info = env.step(int(Q[state_index(obs)].argmax()))
+            if viewer is not None:
+                viewer.draw(env)
+                viewer.tick()
+        scores.append(info["score"])
+    return scores
+
+def main():
+    parser = argparse.ArgumentParser(description="Tabular Q-learning for Flappy Bird")
+    parser.add_argument("--steps", type=int, default=80000, help="Steps of the whole batch of games")
+    parser.add_argument("--envs", type=int, default=256, help="Games trained on in lockstep")
+    parser.add_argument("--alpha", type=float, default=0.3)
+    # Some exploration is needed: the table starts at zero, below the value
+    # of staying alive, so the first action tried in a state would stick
+    parser.add_argument("--epsilon", type=float, default=0.01)
+    parser.add_argument("--gamma", type=float, default=0.99)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--checkpoint", type=str, default="q_table.npy")
+    parser.add_argument("--checkpoint-every", type=int, default=5000, help="Save the table every this many steps")
+    parser.add_argument("--resume", action="store_true", help="Continue training the table in --checkpoint")
+    parser.add_argument("--play", type=int, default=10, help="Greedy episodes to play after training")
+    parser.add_argument("--watch", action="store_true", help="Only play the table in --checkpoint in a pygame window")
+    args = parser.parse_args()
+
+    if args.watch:
+        # pygame is only needed to watch
+        from viewer import FlappyViewer
+        viewer = FlappyViewer()
+        scores = play(load_checkpoint(args.checkpoint, mmap_mode="r"), args.play, args.seed, viewer=viewer)
+        viewer.close()
+        print("Scores:", scores)
+        return
+
+    if args.resume:
+        Q = np.array(load_checkpoint(args.checkpoint))
+    else:
+        Q = new_q_table()
+    print(f"{num_states} states x {num_actions} actions ({Q.nbytes / 1e6:.1f} MB)")
+    train(Q, args.envs, args.steps, args.alpha, args.epsilon, args.gamma, args.seed, args.checkpoint,
+          args.checkpoint_every, report_every=max(1, args.steps // 10))
+    scores = play(load_checkpoint(args.checkpoint, mmap_mode="r"), args.play, args.seed)
+    print(f"Greedy play: mean score {np.mean(scores):.1f}, max {max(scores)}")
+
+if __name__ == "__main__":
+    main()
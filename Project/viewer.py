@@ -0,0 +1,38 @@
+import os
+import pygame
+from bird import BIRD_WIDTH, BIRD_HEIGHT
+from flappy_env import SCREEN_WIDTH, SCREEN_HEIGHT, FPS, GROUND_HEIGHT
+
+# Colors
+WHITE = (255, 255, 255)
+BLUE = (0, 0, 255)
+GREEN = (0, 255, 0)
+
+class FlappyViewer:
+    # Draws a FlappyEnv in a pygame window. The environment never needs it:
+    # training runs headless and a viewer is only opened to watch.
+    def __init__(self, caption="Flappy Bird"):
+        pygame.init()
+        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+        pygame.display.set_caption(caption)
+        # Loaded once and scaled to the bird's hitbox
+        bird_img = pygame.image.load(os.path.join(os.path.dirname(os.path.abspath(__file__)), "bird.png"))
+        self.bird_img = pygame.transform.scale(bird_img, (BIRD_WIDTH, BIRD_HEIGHT))
+        self.clock = pygame.time.Clock()
+
+    def draw(self, env):
+        self.screen.fill(WHITE)
+        for pipe in env.pipes:
+            pygame.draw.rect(self.screen, BLUE, pipe.pipe_top)
+            pygame.draw.rect(self.screen, BLUE, pipe.pipe_bottom)
+        self.screen.blit(self.bird_img, (env.bird.x, env.bird.y))
+        # Draw ground
+        pygame.draw.rect(self.screen, GREEN, (0, SCREEN_HEIGHT - GROUND_HEIGHT, SCREEN_WIDTH, GROUND_HEIGHT))
+        pygame.display.flip()
+
+    def tick(self, fps=FPS):
+        # Control frame rate
+        self.clock.tick(fps)
+
+    def close(self):
+        pygame.quit()
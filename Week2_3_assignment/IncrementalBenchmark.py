@@ -0,0 +1,106 @@
+#! /usr/bin/python
+import argparse,os,tempfile,time
+import numpy as np
+from encoder import MazeEncoder
+from generateMDP import MDP as GeneratedMDP
+from planner import load_mdp_arrays,load_planner_mdp
+
+# Compares re-planning a solved MDP after a small edit with MDP.update()
+# against solving the edited MDP from scratch. The "wall" scenario adds walls
+# to random open cells of a maze (so its neighbours bump instead of entering
+# them, and the new walls lose their actions), the "reward" scenario changes
+# the rewards of random (s, a) pairs of an MDP produced by generateMDP.py.
+# Every state of a generated MDP can move to most others, so a changed reward
+# moves every value: the update then costs about as much as value iteration
+# started from the old values, and only beats a cold solve by the sweeps that
+# the warm start saves. The maze edits are the local case.
+#
+# max|dV| is measured against a reference solve of the edited MDP that is
+# exact to about 1e-9 (sparse hpi with exact evaluation), so it shows the
+# error of every method, the cold ones included. The update must come within
+# 1e-6 of the reference.
+
+TOLERANCE = 1e-6
+
+class IncrementalBenchmark:
+    def __init__(self,scenario,grid_file,S,A,gamma,changes,backend,cold_ls,rseed):
+        rng = np.random.default_rng(rseed)
+        with tempfile.TemporaryDirectory() as tmp:
+            if scenario=="wall":
+                header,transitions,edited,delta,removed = self.wallEdit(grid_file,gamma,changes,rng,tmp)
+            else:
+                header,transitions,edited,delta,removed = self.rewardEdit(S,A,gamma,changes,rng,rseed,tmp)
+
+        mdp = load_planner_mdp(backend=backend,arrays=(header,transitions))
+        mdp.solve("vi")
+        print("%d states, %d transitions, %d changed transitions, %d removed (s, a) pairs (%s backend)"%(
+            header["num_states"],transitions.shape[1],delta.shape[1],removed.shape[1],backend))
+        print("%-18s %10s %10s %12s"%("method","time(s)","backups","max|dV|"))
+
+        start = time.perf_counter()
+        backups = mdp.update(delta,removed)
+        update_time = time.perf_counter()-start
+
+        reference = load_planner_mdp(backend="sparse",evaluation="exact",arrays=edited)
+        reference.solve("hpi")
+        V_ref = np.asarray(reference.V)
+        for algo in cold_ls:
+            cold = load_planner_mdp(backend=backend,arrays=edited)
+            start = time.perf_counter()
+            cold.solve(algo)
+            elapsed = time.perf_counter()-start
+            print("%-18s %10.4f %10s %12.2e"%("cold "+algo,elapsed,cold.stats.get("backups","-"),
+                                            np.abs(np.asarray(cold.V)-V_ref).max()))
+        error = np.abs(np.asarray(mdp.V)-V_ref).max()
+        print("%-18s %10.4f %10d %12.2e"%("incremental update",update_time,backups,error))
+        assert error<=TOLERANCE,"the update is %.2e away from the reference values, more than %g"%(error,TOLERANCE)
+
+    def wallEdit(self,grid_file,gamma,changes,rng,tmp):
+        # Every cell keeps its state ID, so the delta is the (s, a) rows of
+        # the edited maze whose next state differs from the original's, and
+        # the removed pairs are the rows the edited maze no longer has (the
+        # new walls, and cells the walls cut off from every end cell)
+        encoder = MazeEncoder(grid_file,discount=gamma,vectorized=True)
+        header,transitions = encoder.transition_arrays()
+        grid = encoder.grid.copy()
+        cells = rng.choice(np.flatnonzero(grid.ravel()==0),changes,replace=False)
+        grid.ravel()[cells] = 1
+        edited_file = os.path.join(tmp,"grid.txt")
+        np.savetxt(edited_file,grid,fmt="%d",delimiter=" ")
+        edited = MazeEncoder(edited_file,discount=gamma,vectorized=True).transition_arrays()
+
+        A = header["num_actions"]
+        old_next = np.full(header["num_states"]*A,-1)
+        old_next[(transitions[0]*A+transitions[1]).astype(int)] = transitions[2]
+        new = edited[1]
+        moved = old_next[(new[0]*A+new[1]).astype(int)]!=new[2]
+        old_rows = np.unique((transitions[0]*A+transitions[1]).astype(int))
+        gone = np.setdiff1d(old_rows,(new[0]*A+new[1]).astype(int))
+        return header,transitions,edited,new[:,moved],np.array([gone//A,gone%A])
+
+    def rewardEdit(self,S,A,gamma,changes,rng,rseed,tmp):
+        mdp_file = os.path.join(tmp,"mdp.txt")
+        with open(mdp_file,'w') as fw:
+            GeneratedMDP(S,A,gamma,"continuing",rseed,out=fw)
+        header,transitions = load_mdp_arrays(mdp_file)
+        rows = transitions[0]*A+transitions[1]
+        picked = np.isin(rows,rng.choice(np.unique(rows),changes,replace=False))
+        new = transitions.copy()
+        new[3,picked] = rng.uniform(-1,1,int(picked.sum()))
+        return header,transitions,(header,new),new[:,picked],np.zeros((2,0),dtype=int)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenario",type=str,default="wall",choices=["wall","reward"])
+    parser.add_argument("--grid",type=str,default="data/maze/grid100.txt",help="maze for the wall scenario")
+    parser.add_argument("--S",type=int,default=2000,help="states for the reward scenario")
+    parser.add_argument("--A",type=int,default=5,help="actions for the reward scenario")
+    parser.add_argument("--gamma",type=float,default=0.9)
+    parser.add_argument("--changes",type=int,default=1,help="number of new walls or changed (s, a) pairs")
+    parser.add_argument("--backend",type=str,default="sparse",choices=["dict","sparse"])
+    parser.add_argument("--cold",type=str,default="vi",help="comma separated algorithms for the cold solves")
+    parser.add_argument("--rseed",type=int,default=0)
+    args = parser.parse_args()
+    IncrementalBenchmark(args.scenario,args.grid,args.S,args.A,args.gamma,args.changes,args.backend,
+                         args.cold.split(","),args.rseed)
@@ -4,7 +4,7 @@ parser = argparse.ArgumentParser()
 import numpy as np
 random.seed(0)
 
-input_file_ls = ["data/maze/grid10.txt","data/maze/grid20.txt","data/maze/grid30.txt","data/maze/grid40.txt","data/maze/grid50.txt","data/maze/grid60.txt","data/maze/grid70.txt","data/maze/grid80.txt","data/maze/grid90.txt","data/maze/grid100.txt"]
+input_file_ls = ["data/maze/grid10.txt","data/maze/grid20.txt","data/maze/grid30.txt","data/maze/grid40.txt","data/maze/grid50.txt","data/maze/grid60.txt","data/maze/grid70.txt","data/maze/grid80.txt","data/maze/grid90.txt","data/maze/grid100.txt","data/maze/grid40long.txt"]
 #input_flies_ls = ["data/maze/grid30.txt"]
 
 class MazeVerifyOutput:
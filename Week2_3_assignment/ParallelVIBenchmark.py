@@ -0,0 +1,46 @@
+#! /usr/bin/python
+import argparse,os,tempfile,time
+import numpy as np
+from generateMDP import MDP as GeneratedMDP
+from planner import SparseMDP
+
+# Measures the speedup of parallel value iteration (planner.py --algorithm pvi)
+# over the serial sparse value iteration, for increasing worker counts, on an
+# MDP produced by generateMDP.py.
+
+class ParallelVIBenchmark:
+    def __init__(self,S,A,gamma,mdptype,rseed,worker_ls):
+        with tempfile.TemporaryDirectory() as tmp:
+            mdp_file = os.path.join(tmp,"mdp.txt")
+            print("Generating MDP with",S,"states and",A,"actions...")
+            with open(mdp_file,'w') as fw:
+                GeneratedMDP(S,A,gamma,mdptype,rseed,out=fw)
+
+            mdp = SparseMDP(mdp_file)
+            start = time.perf_counter()
+            mdp.value_iteration()
+            serial_time = time.perf_counter()-start
+            V_serial = mdp.V
+            print("%8s %10s %8s %8s %12s"%("workers","time(s)","speedup","sweeps","max|dV|"))
+            print("%8s %10.4f %8.2f %8d %12s"%("serial",serial_time,1.0,mdp.stats["sweeps"],"-"))
+
+            for workers in worker_ls:
+                mdp = SparseMDP(mdp_file,workers=workers)
+                start = time.perf_counter()
+                mdp.parallel_value_iteration()
+                elapsed = time.perf_counter()-start
+                error = np.abs(mdp.V-V_serial).max()
+                print("%8d %10.4f %8.2f %8d %12.2e"%(workers,elapsed,serial_time/elapsed,mdp.stats["sweeps"],error))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--S",type=int,default=2000)
+    parser.add_argument("--A",type=int,default=5)
+    parser.add_argument("--gamma",type=float,default=0.95)
+    parser.add_argument("--mdptype",type=str,default="continuing")
+    parser.add_argument("--rseed",type=int,default=0)
+    parser.add_argument("--workers",type=str,default="1,2,4,8,16,32",help="comma separated worker counts")
+    args = parser.parse_args()
+    worker_ls = [int(w) for w in args.workers.split(",")]
+    ParallelVIBenchmark(args.S,args.A,args.gamma,args.mdptype,args.rseed,worker_ls)
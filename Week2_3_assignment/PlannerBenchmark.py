@@ -0,0 +1,123 @@
+#! /usr/bin/python
+import argparse,contextlib,csv,glob,io,itertools,json,os,resource,subprocess,sys,tempfile,time
+from generateMDP import MDP as GeneratedMDP
+from planner import parse_mdp_file
+
+# Reproducible planner benchmark. MDPs are generated with generateMDP.py's MDP
+# class (so without its 100-state cap) over a sweep of S, A, gamma and MDP
+# type, and every (MDP, algorithm, backend) is solved in a fresh interpreter so
+# that timings and peak RSS are not shared between runs. MDP files given with
+# --files (by default the data/mdp instances) are solved the same way after
+# the generated ones. Results go to a JSON or CSV file, to be compared between
+# commits.
+
+fields = ["commit","file","S","A","gamma","mdptype","rseed","algorithm","backend","status",
+          "parse_time","solve_time","sweeps","backups","policy_iterations","peak_rss_kb"]
+
+def run_single(mdp_file,algorithm,backend):
+    # Runs in the child interpreter: solve one MDP and print one JSON record
+    from planner import import_backend,load_planner_mdp
+    # Backends are imported up front so that their import time (measured by
+    # StartupBenchmark.py) is not counted as parse or solve time
+    backends = ["scipy.sparse","scipy.sparse.linalg","scipy.sparse.csgraph","scipy.optimize"]
+    for name in backends:
+        import_backend(name)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        mdp = load_planner_mdp(mdp_file,backend=backend)
+        parse_time = time.perf_counter()-start
+        start = time.perf_counter()
+        mdp.solve(algorithm)
+        solve_time = time.perf_counter()-start
+    record = {"parse_time":parse_time,"solve_time":solve_time,
+              "peak_rss_kb":resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+    for key in ["sweeps","backups","policy_iterations"]:
+        record[key] = mdp.stats.get(key)
+    print(json.dumps(record))
+
+def current_commit():
+    try:
+        return subprocess.check_output(["git","rev-parse","--short","HEAD"],universal_newlines=True,stderr=subprocess.DEVNULL).strip()
+    except (OSError,subprocess.CalledProcessError):
+        return None
+
+class PlannerBenchmark:
+    def __init__(self,S_ls,A_ls,gamma_ls,type_ls,file_ls,algorithm_ls,backend_ls,rseed,timeout,out_file):
+        self.records = []
+        self.commit = current_commit()
+        self.algorithm_ls,self.backend_ls,self.timeout = algorithm_ls,backend_ls,timeout
+        with tempfile.TemporaryDirectory() as tmp:
+            for S,A,gamma,mdptype in itertools.product(S_ls,A_ls,gamma_ls,type_ls):
+                mdp_file = os.path.join(tmp,"mdp-%s-%d-%d-%g.txt"%(mdptype,S,A,gamma))
+                with open(mdp_file,'w') as fw:
+                    GeneratedMDP(S,A,gamma,mdptype,rseed,out=fw)
+                self.runAll(mdp_file,{"file":None,"S":S,"A":A,"gamma":gamma,"mdptype":mdptype,"rseed":rseed})
+        for mdp_file in file_ls:
+            header,_ = parse_mdp_file(mdp_file)
+            self.runAll(mdp_file,{"file":mdp_file,"S":header["num_states"],"A":header["num_actions"],
+                                  "gamma":header["discount"],"mdptype":header["mdptype"],"rseed":None})
+        self.write(out_file)
+
+    def runAll(self,mdp_file,instance):
+        for algo,backend in itertools.product(self.algorithm_ls,self.backend_ls):
+            record = {"commit":self.commit,**instance,"algorithm":algo,"backend":backend}
+            record.update(self.run(mdp_file,algo,backend,self.timeout))
+            self.records.append(record)
+            print("%-11s S=%-6d A=%-3d gamma=%-5g %-4s %-6s %-8s parse=%s solve=%s rss=%s%s"%(
+                instance["mdptype"],instance["S"],instance["A"],instance["gamma"],algo,backend,record["status"],
+                self.fmt(record.get("parse_time")),self.fmt(record.get("solve_time")),record.get("peak_rss_kb"),
+                "" if instance["file"] is None else " "+instance["file"]))
+
+    def run(self,mdp_file,algo,backend,timeout):
+        cmd = [sys.executable,os.path.abspath(__file__),"--run",mdp_file,algo,backend]
+        try:
+            output = subprocess.check_output(cmd,universal_newlines=True,timeout=timeout,stderr=subprocess.DEVNULL)
+        except subprocess.TimeoutExpired:
+            return {"status":"timeout"}
+        except subprocess.CalledProcessError:
+            return {"status":"error"}
+        record = json.loads(output.strip().splitlines()[-1])
+        record["status"] = "ok"
+        return record
+
+    def fmt(self,seconds):
+        return "-" if seconds is None else "%.4fs"%seconds
+
+    def write(self,out_file):
+        if out_file.endswith(".csv"):
+            with open(out_file,'w',newline='') as fw:
+                writer = csv.DictWriter(fw,fieldnames=fields)
+                writer.writeheader()
+                for record in self.records:
+                    writer.writerow({key:record.get(key) for key in fields})
+        else:
+            with open(out_file,'w') as fw:
+                json.dump(self.records,fw,indent=1)
+        print("Results written to",out_file)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--run",nargs=3,metavar=("MDP","ALGORITHM","BACKEND"),help=argparse.SUPPRESS)
+    parser.add_argument("--S",type=str,default="50,200,500",help="comma separated numbers of states")
+    parser.add_argument("--A",type=str,default="2,5",help="comma separated numbers of actions")
+    parser.add_argument("--gamma",type=str,default="0.9,0.99",help="comma separated discount factors")
+    parser.add_argument("--mdptype",type=str,default="continuing,episodic")
+    parser.add_argument("--files",type=str,default="data/mdp/continuing-*.txt,data/mdp/episodic-*.txt",
+                        help="comma separated MDP files or glob patterns to benchmark after the generated MDPs, "
+                             "or an empty string for none")
+    parser.add_argument("--algorithm",type=str,default="vi,hpi,lp,mpi,sor")
+    parser.add_argument("--backend",type=str,default="dict,sparse")
+    parser.add_argument("--rseed",type=int,default=0)
+    parser.add_argument("--timeout",type=float,default=600,help="seconds allowed per run")
+    parser.add_argument("--out",type=str,default="planner_benchmark.json",help=".json or .csv output file")
+    args = parser.parse_args()
+
+    if args.run:
+        run_single(*args.run)
+        sys.exit(0)
+
+    PlannerBenchmark([int(s) for s in args.S.split(",")],[int(a) for a in args.A.split(",")],
+                     [float(g) for g in args.gamma.split(",")],args.mdptype.split(","),
+                     sorted(f for pattern in args.files.split(",") if pattern for f in glob.glob(pattern)),
+                     args.algorithm.split(","),args.backend.split(","),args.rseed,args.timeout,args.out)
@@ -0,0 +1,41 @@
+#! /usr/bin/python
+import argparse,subprocess,sys,time
+import numpy as np
+
+# Measures the wall time of complete planner invocations on a small MDP,
+# i.e. mostly interpreter startup and imports, for each algorithm/backend.
+# The planner is run through "import planner" so that its bytecode cache is
+# used. The "eager pulp" rows import pulp first, which is what every
+# invocation paid when pulp was imported at the top of planner.py.
+
+configs = [("vi","dict"),("hpi","dict"),("lp","dict"),("vi","sparse"),("hpi","sparse"),("lp","sparse")]
+
+class StartupBenchmark:
+    def __init__(self,mdp_file,repeats):
+        print("%-22s %12s %12s"%("command","median(ms)","min(ms)"))
+        self.report("python (empty)",[sys.executable,"-c","pass"],repeats)
+        self.report("import pulp",[sys.executable,"-c","import pulp"],repeats)
+        for algo,backend in configs:
+            self.report(algo+" "+backend,self.planner_cmd(mdp_file,algo,backend,""),repeats)
+        for algo in ["vi","hpi"]:
+            self.report(algo+" dict (eager pulp)",self.planner_cmd(mdp_file,algo,"dict","import pulp;"),repeats)
+
+    def planner_cmd(self,mdp_file,algo,backend,prelude):
+        argv = ['planner.py','--mdp',mdp_file,'--algorithm',algo,'--backend',backend]
+        return [sys.executable,"-c",prelude+"import sys,planner;sys.argv=%r;planner.main()"%argv]
+
+    def report(self,name,cmd,repeats):
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            subprocess.run(cmd,stdout=subprocess.DEVNULL,stderr=subprocess.DEVNULL,check=True)
+            times.append((time.perf_counter()-start)*1000)
+        print("%-22s %12.1f %12.1f"%(name,np.median(times),min(times)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mdp",type=str,default="data/mdp/continuing-mdp-2-2.txt")
+    parser.add_argument("--repeats",type=int,default=10)
+    args = parser.parse_args()
+    StartupBenchmark(args.mdp,args.repeats)
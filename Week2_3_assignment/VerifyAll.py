@@ -0,0 +1,154 @@
+#! /usr/bin/python
+import argparse,contextlib,io,multiprocessing,os,subprocess,sys,tempfile,time
+import numpy as np
+from PlannerVerifyOutput import input_file_ls as mdp_file_ls
+from MazeVerifyOutput import input_file_ls as grid_file_ls
+
+# Runs the PlannerVerifyOutput.py and MazeVerifyOutput.py test cases in a
+# process pool and reports one line per case with its wall time. By default
+# planner, encoder and decoder are called in-process; with --subprocess each
+# case runs the command line scripts in its own temporary directory, so that
+# runs never share mdpFile or value_and_policy_file.
+
+here = os.path.dirname(os.path.abspath(__file__))
+directions = {'N':(-1,0),'S':(1,0),'E':(0,1),'W':(0,-1)}
+
+@contextlib.contextmanager
+def quietStdout():
+    # Discard everything written to standard output, including by child
+    # programs and C extensions, which write to file descriptor 1
+    sys.stdout.flush()
+    saved = os.dup(1)
+    devnull = os.open(os.devnull,os.O_WRONLY)
+    os.dup2(devnull,1)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+    finally:
+        os.dup2(saved,1)
+        os.close(devnull);os.close(saved)
+
+def runPlanner(in_file,algo,backend,use_subprocess,tmp):
+    # The planner's standard output for one MDP file
+    if use_subprocess:
+        cmd = sys.executable,os.path.join(here,"planner.py"),"--mdp",os.path.abspath(in_file),"--algorithm",algo,"--backend",backend
+        return subprocess.check_output(cmd,universal_newlines=True,cwd=tmp,stderr=subprocess.DEVNULL)
+    from planner import load_planner_mdp
+    with quietStdout():
+        mdp = load_planner_mdp(in_file,backend=backend)
+        mdp.solve(algo)
+    out = io.StringIO()
+    mdp.print_results(file=out)
+    return out.getvalue()
+
+def runMaze(in_file,algo,backend,use_subprocess,tmp):
+    # The path printed by encoder -> planner -> decoder for one grid
+    if use_subprocess:
+        mdpFile = os.path.join(tmp,"mdpFile")
+        vpFile = os.path.join(tmp,"value_and_policy_file")
+        grid = os.path.abspath(in_file)
+        for cmd,out_file in [(("encoder.py","--grid",grid),mdpFile),
+                             (("planner.py","--mdp",mdpFile,"--algorithm",algo,"--backend",backend),vpFile),
+                             (("decoder.py","--grid",grid,"--value_policy",vpFile),None)]:
+            output = subprocess.check_output((sys.executable,os.path.join(here,cmd[0]))+cmd[1:],
+                                             universal_newlines=True,cwd=tmp,stderr=subprocess.DEVNULL)
+            if out_file:
+                fw = open(out_file,'w');fw.write(output);fw.close()
+        return output
+    from encoder import MazeEncoder
+    from decoder import MazeDecoder
+    from planner import load_planner_mdp
+    encoder = MazeEncoder(in_file)
+    with quietStdout():
+        mdp = load_planner_mdp(backend=backend,arrays=encoder.transition_arrays())
+        mdp.solve(algo)
+    decoder = MazeDecoder(in_file,V=mdp.V,pi=mdp.pi,grid=encoder.grid)
+    return " ".join(decoder.simulate_policy())
+
+def checkPlanner(output,in_file,tol):
+    # Same checks as PlannerVerifyOutput.py, on whole columns at once
+    sol_file = in_file.replace("continuing","sol-continuing").replace("episodic","sol-episodic")
+    base = np.loadtxt(sol_file,delimiter=" ",dtype=float,ndmin=2)
+    est = [line.split() for line in output.split("\n") if line!='']
+    if len(est)!=base.shape[0]:
+        return "expected %d lines but have %d"%(base.shape[0],len(est))
+    if any(len(line)!=2 for line in est):
+        return "each line should have only value,policy for a state"
+    error = np.abs(np.array([line[0] for line in est],dtype=float)-base[:,0])
+    bad = np.flatnonzero(error>tol)
+    if bad.size:
+        return "%d states off by more than %g (max error %.6f at state %d)"%(bad.size,tol,error.max(),error.argmax())
+    return None
+
+def checkMaze(output,in_file):
+    # Same checks as MazeVerifyOutput.py: the path stays off walls, ends at
+    # an end cell and is as short as the solution's
+    grid = np.loadtxt(in_file,delimiter=" ",dtype=int)
+    path = output.split()
+    if any(step not in directions for step in path):
+        return "invalid direction printed"
+    start = np.argwhere(grid==2)[0]
+    cells = start+np.cumsum(np.array([directions[step] for step in path],dtype=int).reshape(-1,2),axis=0)
+    inside = ((cells>=0)&(cells<grid.shape)).all(axis=1)
+    if not inside.all() or (grid[cells[:,0],cells[:,1]]==1).any():
+        return "wall ahead, unable to traverse the path"
+    last = cells[-1] if len(cells) else start
+    if grid[last[0],last[1]]!=3:
+        return "invalid path, it does not reach an end cell"
+    fr = open(in_file.replace("grid","solution"),'r');base = fr.read().split();fr.close()
+    if len(path)>len(base):
+        return "path of length %d is not a shortest path (%d)"%(len(path),len(base))
+    if len(path)<len(base):
+        return "path of length %d is shorter than the shortest path (%d)"%(len(path),len(base))
+    return None
+
+def runCase(case):
+    kind,in_file,algo,backend,use_subprocess,tol = case
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            if kind=="planner":
+                error = checkPlanner(runPlanner(in_file,algo,backend,use_subprocess,tmp),in_file,tol)
+            else:
+                error = checkMaze(runMaze(in_file,algo,backend,use_subprocess,tmp),in_file)
+        except Exception as e:
+            error = "%s: %s"%(type(e).__name__,e)
+    return case,error,time.perf_counter()-start
+
+class VerifyAll:
+    def __init__(self,suites,planner_algos,maze_algo,backend,processes,use_subprocess,tol):
+        cases = []
+        if "planner" in suites:
+            cases += [("planner",f,algo,backend,use_subprocess,tol) for algo in planner_algos for f in mdp_file_ls]
+        if "maze" in suites:
+            cases += [("maze",f,maze_algo,backend,use_subprocess,tol) for f in grid_file_ls]
+
+        start = time.perf_counter()
+        with multiprocessing.Pool(processes) as pool:
+            results = pool.map(runCase,cases,chunksize=1)
+        total = time.perf_counter()-start
+
+        self.failures = 0
+        for (kind,in_file,algo,backend,_,_),error,seconds in results:
+            self.failures += error is not None
+            print("%-7s %-4s %-6s %-36s %9.3fs  %s"%(kind,algo,backend,in_file,seconds,"OK" if error is None else "FAILED: "+error))
+        print("%d/%d cases passed in %.3fs (%.3fs of case time)"%(len(results)-self.failures,len(results),total,
+                                                                 sum(r[2] for r in results)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--suite",type=str,default="planner,maze",help="comma separated suites: planner, maze")
+    parser.add_argument("--algorithm",type=str,default="all",help="planner algorithm, or all for hpi,vi,lp")
+    parser.add_argument("--maze_algorithm",type=str,default="hpi")
+    parser.add_argument("--backend",type=str,default="dict")
+    parser.add_argument("--processes",type=int,default=None,help="worker processes (default: CPU count)")
+    parser.add_argument("--subprocess",action="store_true",help="run the command line scripts, each case in a temporary directory")
+    parser.add_argument("--tol",type=float,default=1e-4,help="allowed absolute error of each value")
+    args = parser.parse_args()
+
+    os.chdir(here)
+    planner_algos = ['hpi','vi','lp'] if args.algorithm=='all' else args.algorithm.split(",")
+    verify = VerifyAll(args.suite.split(","),planner_algos,args.maze_algorithm,args.backend,
+                       args.processes,args.subprocess,args.tol)
+    sys.exit(1 if verify.failures else 0)
@@ -1,68 +1,115 @@
 import argparse
+import numpy as np
 
 class MazeDecoder:
-    def __init__(self, grid_file, value_policy_file):
-        self.grid = self.load_grid(grid_file)
+    def __init__(self, grid_file, value_policy_file=None, V=None, pi=None, grid=None, state_cells=None):
+        # The value function and policy come either from a planner output
+        # file or directly from the planner's V/pi arrays, and an already
+        # loaded grid can be passed in place of re-reading grid_file. For a
+        # pruned encoding, state_cells gives the cell ID of each state.
+        self.grid = grid if grid is not None else self.load_grid(grid_file)
         self.num_rows = len(self.grid)
         self.num_cols = len(self.grid[0])
-        self.value_policy = self.load_value_policy(value_policy_file)
+        if value_policy_file is not None:
+            V, pi = self.load_value_policy(value_policy_file)
+        if state_cells is not None:
+            V, pi = self.expand_to_cells(V, pi, state_cells)
+        self.V = np.asarray(V, dtype=float)
+        self.pi = np.asarray(pi, dtype=np.int8)
+        self.action_names = ["N", "S", "E", "W"]
         self.actions = {"N": (-1, 0), "S": (1, 0), "E": (0, 1), "W": (0, -1)}
+        self.build_index()
+
+    def build_index(self):
+        # Index the grid once: the start state, a mask of end states, and the
+        # state reached from every state by following the policy
+        grid = np.asarray(self.grid)
+        ids = np.arange(grid.size).reshape(grid.shape)
+        start = np.flatnonzero(grid == 2)
+        self.start_state = int(start[0]) if start.size else None
+        self.end_mask = (grid == 3).ravel()
+
+        open_cells = np.pad(grid != 1, 1, constant_values=False)
+        next_by_action = np.empty((grid.size, len(self.action_names)), dtype=np.int64)
+        for a, name in enumerate(self.action_names):
+            dr, dc = self.actions[name]
+            valid = open_cells[1 + dr:1 + dr + self.num_rows, 1 + dc:1 + dc + self.num_cols]
+            next_by_action[:, a] = np.where(valid, ids + dr * self.num_cols + dc, ids).ravel()
+        self.policy_next = next_by_action[np.arange(grid.size), self.pi[:grid.size]]
 
     def load_grid(self, grid_file):
-        # Read the maze grid from the file
+        # Read the maze grid from the file: 0 empty, 1 wall, 2 start, 3 end
         with open(grid_file, 'r') as f:
-            grid = [list(line.strip()) for line in f.readlines()]
+            grid = [[int(cell) for cell in line.split()] for line in f if line.strip()]
         return grid
 
     def load_value_policy(self, value_policy_file):
-        # Read the value function and policy from the file
-        with open(value_policy_file, 'r') as f:
-            lines = f.readlines()
+        # Read the planner output: one "value action" line per state
+        table = np.loadtxt(value_policy_file, ndmin=2)
+        return table[:, 0], table[:, 1].astype(int)
 
-        value_policy = {}
-        for line in lines:
-            state, value, policy = line.strip().split()
-            value_policy[int(state)] = (float(value), policy)
-        return value_policy
+    def expand_to_cells(self, V, pi, state_cells):
+        # Translate per-state values and actions back to one entry per cell
+        num_cells = self.num_rows * self.num_cols
+        cell_V, cell_pi = np.zeros(num_cells), np.zeros(num_cells, dtype=np.int8)
+        cell_V[state_cells] = V
+        cell_pi[state_cells] = pi
+        return cell_V, cell_pi
 
     def state_to_id(self, row, col):
         # Convert the (row, col) position to a unique state ID
         return row * self.num_cols + col
 
-    def simulate_policy(self):
+    def simulate_policy(self, start_state=None):
         # Simulate the optimal policy and find the path from start to end
-        start_state = self.get_start_state()
+        if start_state is None:
+            start_state = self.get_start_state()
         current_state = start_state
+        visited = np.zeros(len(self.end_mask), dtype=bool)
         path = []
 
-        while current_state not in self.get_end_states():
-            _, policy = self.value_policy[current_state]
-            path.append(policy)
-            action = self.actions[policy]
-            next_state = self.get_next_state(current_state, action)
-            current_state = next_state
+        while not self.end_mask[current_state]:
+            if visited[current_state]:
+                raise ValueError(f"The policy loops without reaching an end state from state {start_state}")
+            visited[current_state] = True
+            path.append(self.action_names[self.pi[current_state]])
+            current_state = self.policy_next[current_state]
 
         return path
 
+    def simulate_policies(self, start_states):
+        # Decode the paths from many start states at once, stepping all of
+        # them together through the policy table. Starts from which the
+        # policy never reaches an end state get None instead of a path.
+        reaches_end = self.end_mask.copy()
+        while True:
+            extended = reaches_end | reaches_end[self.policy_next]
+            if np.array_equal(extended, reaches_end):
+                break
+            reaches_end = extended
+
+        start_states = np.asarray(start_states, dtype=np.int64)
+        paths = [[] if reaches_end[s] else None for s in start_states.tolist()]
+        current = start_states.copy()
+        active = np.flatnonzero(reaches_end[current] & ~self.end_mask[current])
+        while active.size:
+            for i, a in zip(active.tolist(), self.pi[current[active]].tolist()):
+                paths[i].append(self.action_names[a])
+            current[active] = self.policy_next[current[active]]
+            active = active[~self.end_mask[current[active]]]
+        return paths
+
     def get_start_state(self):
-        # Find the start state in the value_policy dictionary
-        for state, (_, policy) in self.value_policy.items():
-            if policy == "start":
-                return state
+        return self.start_state
 
     def get_end_states(self):
-        # Find the end states in the value_policy dictionary
-        end_states = set()
-        for state, (_, policy) in self.value_policy.items():
-            if policy == "end":
-                end_states.add(state)
-        return end_states
+        return set(np.flatnonzero(self.end_mask).tolist())
 
     def get_next_state(self, state, action):
         # Get the next state based on the action
         next_row = state // self.num_cols + action[0]
         next_col = state % self.num_cols + action[1]
-        if 0 <= next_row < self.num_rows and 0 <= next_col < self.num_cols and self.grid[next_row][next_col] != "1":
+        if 0 <= next_row < self.num_rows and 0 <= next_col < self.num_cols and self.grid[next_row][next_col] != 1:
             return self.state_to_id(next_row, next_col)
         return state
 
@@ -70,15 +117,17 @@ def main():
     parser = argparse.ArgumentParser(description="Maze Decoder")
     parser.add_argument("--grid", type=str, help="Path to the input maze grid file")
     parser.add_argument("--value_policy", type=str, help="Path to the value and policy file")
+    parser.add_argument("--mapping", type=str, help="State to cell mapping written by encoder.py --mapping")
     args = parser.parse_args()
 
     if not args.grid or not args.value_policy:
         print("Both --grid and --value_policy arguments are required.")
         return
 
-    decoder = MazeDecoder(args.grid, args.value_policy)
+    state_cells = np.loadtxt(args.mapping, dtype=np.int64, ndmin=1) if args.mapping else None
+    decoder = MazeDecoder(args.grid, args.value_policy, state_cells=state_cells)
     path = decoder.simulate_policy()
     print(" ".join(path))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
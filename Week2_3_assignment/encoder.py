@@ -1,53 +1,218 @@
 import argparse
+import sys
+import numpy as np
 
 class MazeEncoder:
-    def __init__(self, grid_file):
-        self.grid = self.load_grid(grid_file)
+    # Row and column offsets of the actions, in the order of self.actions
+    moves = [(-1, 0), (1, 0), (0, 1), (0, -1)]
+
+    def __init__(self, grid_file, discount=1.0, vectorized=False, prune=False):
+        # In vectorized mode the grid is a NumPy array and the transitions
+        # are computed with shifted masks instead of a loop over the cells.
+        # With prune, only cells reachable from the start become states, and
+        # state_cells maps each state back to its cell ID.
+        self.vectorized = vectorized
+        self.prune = prune
+        self.state_cells = None
+        self.grid = self.load_grid_array(grid_file) if vectorized else self.load_grid(grid_file)
         self.num_rows = len(self.grid)
         self.num_cols = len(self.grid[0])
+        self.discount = discount
         self.mdp = []
         self.actions = ["N", "S", "E", "W"]
 
     def load_grid(self, grid_file):
-        # Read the maze grid from the file
+        # Read the maze grid from the file: 0 empty, 1 wall, 2 start, 3 end
         with open(grid_file, 'r') as f:
-            grid = [list(line.strip()) for line in f.readlines()]
+            grid = [[int(cell) for cell in line.split()] for line in f if line.strip()]
         return grid
 
+    def load_grid_array(self, grid_file):
+        # Read the maze grid into a 2D int array in a single parsing pass
+        with open(grid_file, 'r') as f:
+            text = f.read()
+        num_rows = sum(1 for line in text.splitlines() if line.strip())
+        return np.fromstring(text, dtype=np.int64, sep=' ').reshape(num_rows, -1)
+
     def state_to_id(self, row, col):
         # Convert the (row, col) position to a unique state ID
         return row * self.num_cols + col
 
     def is_valid_move(self, row, col, action):
         # Check if the move is valid (doesn't hit a wall)
-        if action == "N" and row > 0 and self.grid[row - 1][col] != "1":
+        if action == "N" and row > 0 and self.grid[row - 1][col] != 1:
             return True
-        elif action == "S" and row < self.num_rows - 1 and self.grid[row + 1][col] != "1":
+        elif action == "S" and row < self.num_rows - 1 and self.grid[row + 1][col] != 1:
             return True
-        elif action == "E" and col < self.num_cols - 1 and self.grid[row][col + 1] != "1":
+        elif action == "E" and col < self.num_cols - 1 and self.grid[row][col + 1] != 1:
             return True
-        elif action == "W" and col > 0 and self.grid[row][col - 1] != "1":
+        elif action == "W" and col > 0 and self.grid[row][col - 1] != 1:
             return True
         return False
 
-    def encode_mdp(self):
-        # Encode the maze as an MDP
+    def transition_arrays(self):
+        # Encode the maze as an MDP, returning the planner's (header,
+        # transitions) arrays. Every move costs -1; a move into a wall leaves
+        # the agent where it is. Action i is self.actions[i]. By default the
+        # costs are undiscounted, so the value of a cell is minus its
+        # distance to the nearest end cell however long the path is.
+        if self.vectorized:
+            header, transitions = self.transition_arrays_vectorized()
+        else:
+            header, transitions = self.transition_arrays_loop()
+        header, transitions = self.drop_unsolvable(header, transitions)
+        if self.prune:
+            header, transitions = self.prune_unreachable(header, transitions)
+        return header, transitions
+
+    def transition_arrays_loop(self):
+        # One state per cell, with the cell's ID as the state ID
+        start_state, end_states = None, []
+        rows = []
         for row in range(self.num_rows):
             for col in range(self.num_cols):
                 state = self.state_to_id(row, col)
-                if self.grid[row][col] == "3":
-                    # End state
-                    self.mdp.append(f"numStates 1\nnumActions 1\nstart {state}\nend {state}\n")
-                elif self.grid[row][col] != "1":
-                    # Non-wall state
-                    num_actions = 0
-                    for action in self.actions:
+                if self.grid[row][col] == 3:
+                    end_states.append(state)
+                elif self.grid[row][col] != 1:
+                    if self.grid[row][col] == 2:
+                        start_state = state
+                    for a, action in enumerate(self.actions):
+                        next_state = state
                         if self.is_valid_move(row, col, action):
-                            num_actions += 1
                             next_row, next_col = self.get_next_position(row, col, action)
                             next_state = self.state_to_id(next_row, next_col)
-                            self.mdp.append(f"transition {state} {action} {next_state} 0.0 1.0\n")
-                    self.mdp.append(f"numStates 1\nnumActions {num_actions}\nstart {state}\nend -1\n")
+                        rows.append((state, a, next_state, -1.0, 1.0))
+
+        header = {
+            "num_states": self.num_rows * self.num_cols,
+            "num_actions": len(self.actions),
+            "start_state": start_state,
+            "end_states": end_states,
+            "mdptype": "episodic",
+            "discount": self.discount,
+        }
+        transitions = np.array(rows, dtype=float).reshape(-1, 5).T.copy()
+        return header, transitions
+
+    def transition_arrays_vectorized(self):
+        # Same transitions as transition_arrays, in the same order, computed
+        # for all cells at once. A cell can move in a direction if the cell
+        # next to it is inside the grid and not a wall, which is the open
+        # mask shifted by one in that direction.
+        grid = self.grid
+        ids = np.arange(grid.size).reshape(grid.shape)
+        open_cells = np.pad(grid != 1, 1, constant_values=False)
+        sources = (grid != 1) & (grid != 3)
+
+        next_states = np.empty(grid.shape + (len(self.actions),), dtype=np.int64)
+        for a, (dr, dc) in enumerate(self.moves):
+            valid = open_cells[1 + dr:1 + dr + self.num_rows, 1 + dc:1 + dc + self.num_cols]
+            next_states[..., a] = np.where(valid, ids + dr * self.num_cols + dc, ids)
+
+        states = np.repeat(ids[sources], len(self.actions))
+        transitions = np.empty((5, states.size))
+        transitions[0] = states
+        transitions[1] = np.tile(np.arange(len(self.actions)), int(sources.sum()))
+        transitions[2] = next_states[sources].ravel()
+        transitions[3] = -1.0
+        transitions[4] = 1.0
+
+        start = np.flatnonzero(grid == 2)
+        header = {
+            "num_states": int(grid.size),
+            "num_actions": len(self.actions),
+            "start_state": int(start[0]) if start.size else None,
+            "end_states": np.flatnonzero(grid == 3).tolist(),
+            "mdptype": "episodic",
+            "discount": self.discount,
+        }
+        return header, transitions
+
+    def drop_unsolvable(self, header, transitions):
+        # Remove the transitions of cells from which no end cell can be
+        # reached, leaving them as states without actions (value 0). Moves
+        # are reversible, so these are the regions of open cells that hold no
+        # end cell. Undiscounted, their values would fall without bound and
+        # value iteration would never converge.
+        from scipy.sparse import csr_matrix
+        from scipy.sparse.csgraph import connected_components
+
+        num_cells = header["num_states"]
+        states, next_states = transitions[0].astype(np.int64), transitions[2].astype(np.int64)
+        graph = csr_matrix((np.ones(len(states)), (states, next_states)), shape=(num_cells, num_cells))
+        _, labels = connected_components(graph, directed=False)
+        solvable = np.isin(labels, labels[header["end_states"]])
+        if solvable[states].all():
+            return header, transitions
+        return header, transitions[:, solvable[states]].copy()
+
+    def prune_unreachable(self, header, transitions):
+        # Breadth-first search from the start state over the transition
+        # graph, then keep only the reached states, renumbered densely in
+        # cell order. Walls and cells cut off from the start are dropped.
+        from scipy.sparse import csr_matrix
+        from scipy.sparse.csgraph import breadth_first_order
+
+        num_cells = header["num_states"]
+        graph = csr_matrix((np.ones(transitions.shape[1]), (transitions[0].astype(np.int64),
+                            transitions[2].astype(np.int64))), shape=(num_cells, num_cells))
+        reached = breadth_first_order(graph, header["start_state"], return_predecessors=False)
+        keep = np.zeros(num_cells, dtype=bool)
+        keep[reached] = True
+
+        self.state_cells = np.flatnonzero(keep)
+        new_ids = np.full(num_cells, -1, dtype=np.int64)
+        new_ids[self.state_cells] = np.arange(len(self.state_cells))
+
+        transitions = transitions[:, keep[transitions[0].astype(np.int64)]].copy()
+        transitions[0] = new_ids[transitions[0].astype(np.int64)]
+        transitions[2] = new_ids[transitions[2].astype(np.int64)]
+        header = dict(header,
+                      num_states=len(self.state_cells),
+                      start_state=int(new_ids[header["start_state"]]),
+                      end_states=[int(new_ids[s]) for s in header["end_states"] if keep[s]])
+        return header, transitions
+
+    def write_mapping(self, mapping_file):
+        # Write the cell ID of every state, one per line, for the decoder
+        np.savetxt(mapping_file, self.state_cells, fmt="%d")
+
+    def write_mdp(self, f, chunk_size=100000):
+        # Write the MDP in the planner's text format. The transition lines are
+        # formatted a chunk at a time with a single % over a repeated template.
+        # Rewards and probabilities are uniform in a maze, so when a chunk has
+        # a single (r, p) they are baked into the template and only the
+        # integer columns are formatted.
+        header, transitions = self.transition_arrays()
+        f.write(f"numStates {header['num_states']}\n")
+        f.write(f"numActions {header['num_actions']}\n")
+        f.write(f"start {header['start_state']}\n")
+        f.write(f"end {' '.join(map(str, header['end_states']))}\n")
+        for lo in range(0, transitions.shape[1], chunk_size):
+            chunk = transitions[:, lo:lo + chunk_size]
+            r, p = chunk[3], chunk[4]
+            if (r == r[0]).all() and (p == p[0]).all():
+                line = f"transition %d %d %d {float(r[0])} {float(p[0])}\n"
+                values = chunk[:3].T.astype(np.int64).ravel().tolist()
+            else:
+                line = "transition %d %d %d %r %r\n"
+                values = chunk.T.ravel().tolist()
+            f.write((line * chunk.shape[1]) % tuple(values))
+        f.write(f"mdptype {header['mdptype']}\n")
+        f.write(f"discount {header['discount']}\n")
+
+    def encode_mdp(self):
+        # Encode the maze as an MDP file in the planner's text format
+        header, transitions = self.transition_arrays()
+        self.mdp.append(f"numStates {header['num_states']}\n")
+        self.mdp.append(f"numActions {header['num_actions']}\n")
+        self.mdp.append(f"start {header['start_state']}\n")
+        self.mdp.append(f"end {' '.join(map(str, header['end_states']))}\n")
+        for s1, a, s2, r, p in transitions.T.tolist():
+            self.mdp.append(f"transition {int(s1)} {int(a)} {int(s2)} {r} {p}\n")
+        self.mdp.append(f"mdptype {header['mdptype']}\n")
+        self.mdp.append(f"discount {header['discount']}\n")
 
     def get_next_position(self, row, col, action):
         # Get the next position based on the action
@@ -68,15 +233,26 @@ class MazeEncoder:
 def main():
     parser = argparse.ArgumentParser(description="Maze Encoder")
     parser.add_argument("--grid", type=str, help="Path to the input maze grid file")
+    parser.add_argument("--discount", type=float, default=1.0, help="Discount factor of the encoded MDP")
+    parser.add_argument("--vectorized", action="store_true",
+                        help="Encode with NumPy grid masks and bulk formatted output")
+    parser.add_argument("--mapping", type=str,
+                        help="Keep only cells reachable from the start and write the state to cell mapping here")
     args = parser.parse_args()
 
     if not args.grid:
         print("Please provide the --grid argument with the path to the maze grid file.")
         return
 
-    encoder = MazeEncoder(args.grid)
-    encoder.encode_mdp()
-    encoder.print_mdp()
+    encoder = MazeEncoder(args.grid, discount=args.discount, vectorized=args.vectorized,
+                          prune=args.mapping is not None)
+    if args.vectorized:
+        encoder.write_mdp(sys.stdout)
+    else:
+        encoder.encode_mdp()
+        encoder.print_mdp()
+    if args.mapping:
+        encoder.write_mapping(args.mapping)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,80 +1,126 @@
 #! /usr/bin/python
-import random,argparse,sys
+import argparse,sys
 parser = argparse.ArgumentParser()
 import numpy as np
 
+# States are generated a chunk at a time with NumPy and every chunk's
+# transition lines are formatted in one go, so the generator runs in
+# O(S*A) time and O(chunk) memory and can stream million-state MDPs.
+# The output is determined by rseed.
+
 class MDP():
-    def __init__(self,S,A,gamma,mdptype,rseed):
-        random.seed(rseed)
+    def __init__(self,S,A,gamma,mdptype,rseed,out=None,chunk=20000):
+        self.rng = np.random.default_rng(rseed)
+        self.out = out if out is not None else sys.stdout
+        self.chunk = chunk
         if mdptype=="continuing":
             self.generateContinuingMDP(S,A,gamma,mdptype)
         else:
             assert mdptype=='episodic'
             self.generateEpisodicMDP(S,A,gamma,mdptype)
-    
+
     def generateEpisodicMDP(self,S,A,gamma,mdptype):
-        print("numStates",S)
-        print("numActions",A)
-        start = random.randint(0, S-1)
-        print("start",start)
+        rng = self.rng
+        self.out.write("numStates %d\nnumActions %d\n"%(S,A))
+        start = int(rng.integers(S))
+        self.out.write("start %d\n"%start)
         if S>5:
-            end_ls = random.sample(range(S), random.randint(0, max(2,S//10)))
+            num_end = int(rng.integers(0,max(2,S//10)+1))
         else:
-            end_ls = random.sample(range(S), random.randint(0, min(2,S-2)))
-        path = [i for i in range(S) if i not in end_ls]
-        random.shuffle(path)
-        end_ls.append(path[-1])
-        print("end",' '.join(map(str,end_ls)))
-        #print(path)
-        for s in range(0, S):
-            for a in range(0, A):
-                if s not in end_ls:
-                    degree = random.randint(1,min(5,S))
-                    degree-=1
-                    next_state_in_path = path[path.index(s)+1]
-                    l = [i for i in range(S) if i!=next_state_in_path]
-                    random.shuffle(l)
-                    R = [random.uniform(-1,1) for i in range(degree+1)]
-                    T = [random.randint(1,1000) for i in range(degree)]
-                    if not len(T)==0:
-                        T.append(random.randint(sum(T)//5,sum(T)))
-                    else:
-                        T.append(1)
-                    sumT = sum(T)
-                    for i in range(degree):
-                        print("transition",s,a,l[i],R[i],T[i]/sumT)
-                    
-                    print("transition",s,a,next_state_in_path,R[-1],T[-1]/sumT)
-
-        print("mdptype",mdptype)
-        print("discount ",gamma)
+            num_end = int(rng.integers(0,min(2,S-2)+1))
+        end_ls = rng.choice(S,num_end,replace=False).tolist()
+        is_end = np.zeros(S,dtype=bool)
+        is_end[end_ls] = True
+        path = rng.permutation(np.flatnonzero(~is_end))
+        end_ls.append(int(path[-1]))
+        is_end[path[-1]] = True
+        self.out.write("end %s\n"%' '.join(map(str,end_ls)))
+
+        # Successor of every state along the path, in place of path.index(s)
+        next_in_path = np.full(S,-1)
+        next_in_path[path[:-1]] = path[1:]
+
+        # Each (s, a) gets degree random successors other than its successor
+        # in the path, then the path successor itself, so every non-end state
+        # can reach an end state
+        width = min(5,S)
+        states = np.flatnonzero(~is_end)
+        for lo in range(0,len(states),self.chunk):
+            s,a = self.stateActionRows(states[lo:lo+self.chunk],A)
+            n = len(s)
+            degree = rng.integers(1,width+1,n)-1
+            cols = np.arange(width)
+            succ = np.empty((n,width),dtype=np.int64)
+            succ[:,:width-1] = self.sampleDistinct(S,n,width-1,exclude=next_in_path[s])
+            R = rng.uniform(-1,1,(n,width))
+            T = rng.integers(1,1001,(n,width))
+            T[cols>=degree[:,None]] = 0
+            sumT = T.sum(axis=1)
+            last = np.where(degree>0,rng.integers(sumT//5,sumT+1),1)
+            rows = np.arange(n)
+            succ[rows,degree] = next_in_path[s]
+            T[rows,degree] = last
+            P = T/T.sum(axis=1)[:,None]
+            self.writeTransitions(s,a,succ,R,P,cols<=degree[:,None])
+
+        self.out.write("mdptype %s\n"%mdptype)
+        self.out.write("discount  %s\n"%gamma)
 
 
     def generateContinuingMDP(self,S,A,gamma,mdptype):
-        print("numStates",S)
-        print("numActions",A)
-        print("start 0")
-        print("end -1")
-        #start = random.randint(0, S-1)
-        #print("start",start)
-        #
-        #end = random.sample(range(S), random.randint(1, S-1))
-        #print("end",' '.join(map(str,end)))
-        
-
-        for s in range(0, S):
-            for a in range(0, A):
-                degree = random.randint(1,min(5,S))
-                l = [i for i in range(S)]
-                random.shuffle(l)
-                R = [random.uniform(-1,1) for i in range(degree)]
-                T = [random.random() for i in range(degree)]
-                sumT = sum(T)
-                for i in range(degree):
-                    print("transition",s,a,l[i],R[i],T[i]/sumT)
-
-        print("mdptype",mdptype)
-        print("discount ",gamma)
+        rng = self.rng
+        self.out.write("numStates %d\nnumActions %d\n"%(S,A))
+        self.out.write("start 0\n")
+        self.out.write("end -1\n")
+
+        width = min(5,S)
+        for lo in range(0,S,self.chunk):
+            s,a = self.stateActionRows(np.arange(lo,min(S,lo+self.chunk)),A)
+            n = len(s)
+            degree = rng.integers(1,width+1,n)
+            cols = np.arange(width)
+            used = cols<degree[:,None]
+            succ = self.sampleDistinct(S,n,width)
+            R = rng.uniform(-1,1,(n,width))
+            T = np.where(used,rng.random((n,width)),0.0)
+            P = T/T.sum(axis=1)[:,None]
+            self.writeTransitions(s,a,succ,R,P,used)
+
+        self.out.write("mdptype %s\n"%mdptype)
+        self.out.write("discount  %s\n"%gamma)
+
+    def stateActionRows(self,states,A):
+        # One row per (s, a), ordered by state and then action
+        return np.repeat(states,A),np.tile(np.arange(A),len(states))
+
+    def sampleDistinct(self,S,n,width,exclude=None):
+        # width distinct states per row, none equal to exclude[row], drawn by
+        # redrawing clashing entries (rare unless S is tiny) instead of
+        # shuffling all S states
+        rng = self.rng
+        out = rng.integers(0,S,(n,width))
+        while True:
+            clash = np.zeros((n,width),dtype=bool)
+            for j in range(width):
+                if exclude is not None:
+                    clash[:,j] |= out[:,j]==exclude
+                for i in range(j):
+                    clash[:,j] |= out[:,j]==out[:,i]
+            if not clash.any():
+                return out
+            out[clash] = rng.integers(0,S,int(clash.sum()))
+
+    def writeTransitions(self,s,a,succ,R,P,used):
+        # Write the used entries of each row, in column order, with one
+        # formatting operation for the whole chunk
+        rows,cols = np.nonzero(used)
+        values = np.empty((len(rows),5),dtype=object)
+        values[:,0] = s[rows].tolist()
+        values[:,1] = a[rows].tolist()
+        values[:,2] = succ[rows,cols].tolist()
+        values[:,3] = R[rows,cols].tolist()
+        values[:,4] = P[rows,cols].tolist()
+        self.out.write(("transition %d %d %d %.12g %.12g\n"*len(rows))%tuple(values.ravel().tolist()))
 
 if __name__ == "__main__":
     parser.add_argument("--S",type=int,default=5)
@@ -82,30 +128,27 @@ if __name__ == "__main__":
     parser.add_argument("--gamma",type=float,default=0.9)
     parser.add_argument("--mdptype",type=str,default="continuing")
     parser.add_argument("--rseed",type=int,default=0)
-    
-    
+    parser.add_argument("--nocap",action="store_true",help="allow more than 100 states, e.g. for benchmarking")
+
+
     args = parser.parse_args()
-    if not (args.S>1 and args.S<=100):
+    if not (args.S>1 and (args.S<=100 or args.nocap)):
         print("number of states shoud be from 2 to 100")
         sys.exit(0)
-    
+
     if not (args.A>1 and args.A<=100):
         print("number of actions shoud be from 2 to 100")
         sys.exit(0)
-    
+
     if not (args.gamma>=0 and args.gamma<=1):
         print("gamma should be with in 0 to 1")
         sys.exit(0)
     if not (args.mdptype=="continuing" or args.mdptype=="episodic"):
         print("Type of MDP should be continuing or episodic")
         sys.exit(0)
-    
-    
-    #print(args)
-    algo = MDP(args.S,args.A,args.gamma,args.mdptype,args.rseed)
-
-
-
-
 
 
+    #print(args)
+    out = open(sys.stdout.fileno(),'w',buffering=1<<24,closefd=False)
+    algo = MDP(args.S,args.A,args.gamma,args.mdptype,args.rseed,out=out)
+    out.flush()
@@ -0,0 +1,35 @@
+import argparse
+from encoder import MazeEncoder
+from decoder import MazeDecoder
+from planner import load_planner_mdp
+
+def plan_maze(grid_file, algorithm="sp", backend="sparse", discount=1.0):
+    # Encode, plan and decode a maze in one process. The encoder's transition
+    # arrays go straight into the planner and its V/pi arrays straight into
+    # the decoder, with no MDP or value/policy text in between.
+    # Only cells reachable from the start are planned over.
+    encoder = MazeEncoder(grid_file, discount=discount, vectorized=True, prune=True)
+    mdp = load_planner_mdp(backend=backend, arrays=encoder.transition_arrays())
+    mdp.solve(algorithm)
+    decoder = MazeDecoder(grid_file, V=mdp.V, pi=mdp.pi, grid=encoder.grid,
+                          state_cells=encoder.state_cells)
+    return decoder.simulate_policy()
+
+def main():
+    parser = argparse.ArgumentParser(description="Maze Planner")
+    parser.add_argument("--grid", type=str, help="Path to the input maze grid file")
+    parser.add_argument("--algorithm", type=str, default="sp", help="Planner algorithm to use")
+    parser.add_argument("--backend", type=str, choices=["dict", "sparse"], default="sparse",
+                        help="Planner transition representation")
+    parser.add_argument("--discount", type=float, default=1.0, help="Discount factor of the encoded MDP")
+    args = parser.parse_args()
+
+    if not args.grid:
+        print("Please provide the --grid argument with the path to the maze grid file.")
+        return
+
+    path = plan_maze(args.grid, args.algorithm, args.backend, args.discount)
+    print(" ".join(path))
+
+if __name__ == "__main__":
+    main()
@@ -1,99 +1,588 @@
 import argparse
-from pulp import LpProblem, LpMaximize, LpVariable, lpSum
+import glob
+import hashlib
+import heapq
+import importlib
+import json
+import multiprocessing
+import multiprocessing.connection
+import os
+import sys
+import threading
+import time
+
+# Solver backends (scipy) are imported by import_backend the first time an
+# algorithm needs them, so vi/hpi runs do not pay for the LP stack. Import
+# times are kept for --profile-startup.
+IMPORT_TIMES = {}
+_start = time.perf_counter()
+import numpy as np
+IMPORT_TIMES["numpy"] = time.perf_counter() - _start
+
+def import_backend(name):
+    # Import a solver backend module on first use and record how long it took
+    if name not in sys.modules:
+        start = time.perf_counter()
+        importlib.import_module(name)
+        IMPORT_TIMES[name] = time.perf_counter() - start
+    return sys.modules[name]
+
+def parse_mdp_file(mdp_file):
+    # Parse an MDP file into its header fields and a (5, T) array whose
+    # rows are the s1, a, s2, r, p columns of the T transition lines
+    with open(mdp_file, 'r') as f:
+        text = f.read()
+
+    head = text.split('\n', 4)
+    lines = head[:4]
+    tail = head[4].rstrip().rsplit('\n', 2) if len(head) > 4 else []
+    if len(tail) == 3:
+        block, mdptype_line, discount_line = tail
+    else:
+        block, (mdptype_line, discount_line) = '', tail[-2:]
+
+    header = {
+        "num_states": int(lines[0].split()[1]),
+        "num_actions": int(lines[1].split()[1]),
+        "start_state": int(lines[2].split()[1]),
+        "end_states": [int(s) for s in lines[3].split()[1:]],
+        "mdptype": mdptype_line.split()[1],
+        "discount": float(discount_line.split()[1]),
+    }
+
+    # Parse every number in the transition block in a single pass, and
+    # only look at single lines if that fails or the count is off
+    try:
+        values = np.fromstring(block.replace('transition', ' '), sep=' ')
+    except ValueError:
+        values = None
+    if values is None or values.size != 5 * block.count('transition'):
+        raise_bad_transition(mdp_file, block)
+    transitions = values.reshape(-1, 5).T.copy()
+    return header, transitions
+
+def raise_bad_transition(mdp_file, block):
+    # Find the first transition line that is not "transition s1 a s2 r p"
+    # and raise a ValueError naming it; the block starts on line 5
+    for number, line in enumerate(block.split('\n'), 5):
+        fields = line.split()
+        try:
+            if fields[0] != 'transition' or len(fields) != 6:
+                raise ValueError
+            [int(x) for x in fields[1:4]] + [float(x) for x in fields[4:]]
+        except (ValueError, IndexError):
+            raise ValueError(f"{mdp_file}, line {number}: expected 'transition s1 a s2 r p', got {line!r}") from None
+    raise ValueError(f"{mdp_file}: could not parse the transition lines")
+
+def mdp_cache_paths(mdp_file):
+    return mdp_file + ".cache.json", mdp_file + ".cache.npy"
+
+def file_digest(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def load_mdp_arrays(mdp_file, use_cache=False):
+    # Load the header and transition array of an MDP file. With use_cache,
+    # the parsed transitions are kept in a memory-mapped .npy sidecar next to
+    # the file, which is reused while the file's mtime and size (or, failing
+    # that, its content hash) are unchanged.
+    if not use_cache:
+        return parse_mdp_file(mdp_file)
+
+    meta_path, array_path = mdp_cache_paths(mdp_file)
+    stat = os.stat(mdp_file)
+    digest = None
+    try:
+        with open(meta_path, 'r') as f:
+            meta = json.load(f)
+        fresh = meta["mtime_ns"] == stat.st_mtime_ns and meta["size"] == stat.st_size
+        if not fresh:
+            digest = file_digest(mdp_file)
+            fresh = meta["sha1"] == digest
+        if fresh:
+            return meta["header"], np.load(array_path, mmap_mode='r')
+    except (OSError, ValueError, KeyError):
+        pass
+
+    header, transitions = parse_mdp_file(mdp_file)
+    meta = {
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "sha1": digest or file_digest(mdp_file),
+        "header": header,
+    }
+    try:
+        np.save(array_path, transitions)
+        # The metadata is written last, so it only exists for a complete cache
+        with open(meta_path, 'w') as f:
+            json.dump(meta, f)
+    except OSError:
+        pass
+    return header, transitions
+
+# Every --algorithm, and those only the sparse backend implements
+ALGORITHMS = ["vi", "hpi", "lp", "psvi", "mpi", "sor", "pvi", "sp"]
+SPARSE_ALGORITHMS = ["pvi", "sp"]
+
+def linear_program_values(P, R, end_mask, discount, stats):
+    # Minimise sum(V) subject to V[s] >= R[s, a] + gamma * P[s, a] V for
+    # every state and action, written as one sparse inequality system
+    # (gamma * P - I) V <= -R over the stacked (s, a) rows of P and R, and
+    # handed to HiGHS. End states are fixed at 0. Returns V.
+    sp = import_backend("scipy.sparse")
+    linprog = import_backend("scipy.optimize").linprog
+    num_states = P.shape[1]
+    num_actions = P.shape[0] // num_states
+    start = time.perf_counter()
+    keep = np.tile(~end_mask, num_actions)
+    identity = sp.vstack([sp.identity(num_states, format="csr")] * num_actions)
+    A_ub = (discount * P - identity)[keep]
+    b_ub = -R[keep]
+    bounds = np.where(end_mask[:, None], 0.0, [-np.inf, np.inf])
+    stats["lp_assembly_time"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = linprog(np.ones(num_states), A_ub=A_ub, b_ub=b_ub, bounds=bounds, method="highs")
+    stats["lp_solve_time"] = time.perf_counter() - start
+    if result.status != 0:
+        raise RuntimeError(f"LP solver failed: {result.message}")
+    return result.x
+
+def check_omega(omega, discount):
+    # sor moves every state to (1 - omega) V[s] + omega (T V)[s], which
+    # shrinks errors by |1 - omega| + omega * gamma per sweep: a contraction
+    # for 0 < omega < 2 / (1 + gamma), and plain value iteration at omega = 1
+    if not (0.0 < omega <= 1.0 or 0.0 < omega < 2.0 / (1.0 + discount)):
+        bound = "0 < omega <= 1" if discount >= 1.0 else f"0 < omega < 2 / (1 + gamma) = {2.0 / (1.0 + discount):.4f}"
+        raise ValueError(f"sor does not converge with omega {omega} at gamma {discount}, it needs {bound}")
+
+def relaxation_factor(text):
+    # argparse type of --omega: no MDP converges outside (0, 2), the rest
+    # is checked against gamma once the MDP is loaded
+    omega = float(text)
+    if not 0.0 < omega < 2.0:
+        raise argparse.ArgumentTypeError(f"omega must lie in (0, 2), got {omega}")
+    return omega
 
 class MDP:
-    def __init__(self, mdp_file):
-        self.load_mdp(mdp_file)
+    # Convergence threshold on the largest change in V during a sweep
+    epsilon = 1e-6
+    # Sweeps after which sor gives up
+    max_sweeps = 100000
+
+    def __init__(self, mdp_file=None, use_cache=False, arrays=None, mpi_sweeps=5, omega=1.0):
+        self.use_cache = use_cache
+        # Evaluation sweeps per improvement of modified policy iteration, and
+        # the relaxation factor of successive over-relaxation
+        self.mpi_sweeps = mpi_sweeps
+        self.omega = omega
+        # Counters and timings recorded by the solvers, printed with --stats
+        self.stats = {}
+        # Functions called with a record after every solver iteration. The
+        # records of a solver called directly rather than through solve()
+        # have no algorithm and time from when the MDP was created.
+        self.hooks = []
+        self.algorithm, self.solve_start = None, time.perf_counter()
+        if arrays is not None:
+            self.load_arrays(*arrays)
+        else:
+            self.load_mdp(mdp_file)
         
     def load_mdp(self, mdp_file):
         # Read the MDP file and initialize the MDP instance
-        with open(mdp_file, 'r') as f:
-            lines = f.readlines()
-        
-        self.num_states = int(lines[0].split()[1])
-        self.num_actions = int(lines[1].split()[1])
-        self.start_state = int(lines[2].split()[1])
-        self.end_states = [int(s) for s in lines[3].split()[1:]]
+        self.load_arrays(*load_mdp_arrays(mdp_file, self.use_cache))
+
+    def load_arrays(self, header, transitions):
+        # Initialize the MDP from a header dict and a (5, T) array of
+        # transitions, as produced by parse_mdp_file
+        self.load_header(header)
+        # predecessors(), kept by predecessor_lists() until the transitions change
+        self.predecessor_cache = None
 
         self.transitions = {}
-        for line in lines[4:-2]:
-            s1, a, s2, r, p = map(float, line.split()[1:])
+        for s1, a, s2, r, p in transitions.T.tolist():
             self.transitions.setdefault((int(s1), int(a)), []).append((int(s2), r, p))
 
-        self.mdptype = lines[-2].split()[1]
-        self.discount = float(lines[-1].split()[1])
+        self.reset()
 
-        # Initialize the value function and policy arrays
+    def reset(self):
+        # Initialize the value function and policy arrays, so that the same
+        # MDP can be solved again from scratch by another algorithm
         self.V = [0.0] * self.num_states
         self.pi = [0] * self.num_states
+        self.stats = {}
+
+    def load_value_policy(self, value_policy_file):
+        # Warm start: begin the solvers from the values and policy of a
+        # planner output file, e.g. the solution of a slightly different MDP
+        table = np.loadtxt(value_policy_file, ndmin=2)
+        if len(table) != self.num_states:
+            raise ValueError(f"{value_policy_file} has {len(table)} states, the MDP has {self.num_states}")
+        self.warm_start(table[:, 0], table[:, 1].astype(int))
+
+    def warm_start(self, V, pi):
+        self.V = [float(v) for v in V]
+        self.pi = [int(a) for a in pi]
+
+    def load_header(self, header):
+        self.num_states = header["num_states"]
+        self.num_actions = header["num_actions"]
+        self.start_state = header["start_state"]
+        self.end_states = header["end_states"]
+        self.mdptype = header["mdptype"]
+        self.discount = header["discount"]
 
     def value_iteration(self):
         # Implement Value Iteration to compute V* and π*
-        epsilon = 1e-6
+        tolerance = self.value_tolerance()
+        sweeps = backups = 0
         while True:
             delta = 0.0
             for s in range(self.num_states):
                 if s not in self.end_states:
                     v = self.V[s]
-                    self.V[s] = max(self.q_value(s, a) for a in range(self.num_actions))
+                    self.V[s] = self.bellman_backup(s)
                     delta = max(delta, abs(self.V[s] - v))
-            if delta < epsilon:
+                    backups += 1
+            sweeps += 1
+            if self.hooks:
+                self.trace("sweep", sweeps, delta=delta,
+                           q_evaluations=(backups // sweeps) * self.num_actions)
+            if delta < tolerance:
                 break
+        self.stats["sweeps"] = sweeps
+        self.stats["backups"] = backups
 
         # Compute the optimal policy using the computed values
         self.compute_optimal_policy()
 
     def howards_policy_iteration(self):
-        # Implement Howard's Policy Iteration to compute V* and π*
-        self.pi = [0] * self.num_states  # Initialize the policy arbitrarily
+        # Implement Howard's Policy Iteration to compute V* and π*, starting
+        # from the current policy (all 0 after reset(), or a warm start)
+        self.make_policy_proper()
+        self.stats["policy_iterations"] = 0
         while True:
             self.policy_evaluation()
-            policy_stable = True
+            self.stats["policy_iterations"] += 1
+            switches = improved = 0
             for s in range(self.num_states):
                 if s not in self.end_states:
                     a = self.best_action(s)
+                    improved += 1
                     if a != self.pi[s]:
-                        policy_stable = False
+                        switches += 1
                         self.pi[s] = a
-            if policy_stable:
+            if self.hooks:
+                self.trace("improvement", self.stats["policy_iterations"], policy_switches=switches,
+                           q_evaluations=improved * self.num_actions)
+            if switches == 0:
                 break
 
     def linear_programming(self):
-        # Implement Linear Programming to compute V* and π*
-        model = LpProblem(name="MDP_LP", sense=LpMaximize)
-        V = [LpVariable(name=f"V_{s}", lowBound=None) for s in range(self.num_states)]
+        # Implement Linear Programming to compute V*: the (s, a) outcome lists
+        # are assembled into the same sparse P and R as SparseMDP's, and the
+        # LP is solved by linear_program_values
+        sp = import_backend("scipy.sparse")
+        rows, next_states, rewards, probs = self.transition_coo()
+        num_rows = self.num_actions * self.num_states
+        P = sp.csr_matrix((probs, (rows, next_states)), shape=(num_rows, self.num_states))
+        R = np.bincount(rows, weights=probs * rewards, minlength=num_rows)
+        end_mask = np.zeros(self.num_states, dtype=bool)
+        end_mask[[s for s in self.end_states if 0 <= s < self.num_states]] = True
 
-        # Objective function
-        model += lpSum(V[s] for s in range(self.num_states))
+        self.V = linear_program_values(P, R, end_mask, self.discount, self.stats).tolist()
 
-        # Constraints
-        for s in range(self.num_states):
-            if s in self.end_states:
-                model += V[s] == 0.0
-            else:
-                q_values = [self.q_value(s, a) for a in range(self.num_actions)]
-                model += V[s] >= lpSum(q_values)
+        # Compute the optimal policy using the computed values
+        self.compute_optimal_policy()
 
-        # Solve the linear program
-        model.solve()
+    def transition_coo(self):
+        # The transitions as COO arrays (row a * num_states + s, s2, r, p)
+        rows, next_states, rewards, probs = [], [], [], []
+        for (s, a), outcomes in self.transitions.items():
+            for s2, r, p in outcomes:
+                rows.append(a * self.num_states + s)
+                next_states.append(s2)
+                rewards.append(r)
+                probs.append(p)
+        return (np.array(rows, dtype=np.int64), np.array(next_states, dtype=np.int64),
+                np.array(rewards, dtype=float), np.array(probs, dtype=float))
 
-        # Extract the results
-        for s in range(self.num_states):
-            self.V[s] = V[s].value()
+    def make_policy_proper(self):
+        # Undiscounted, a policy can only be evaluated if it is proper: from
+        # every state it reaches an end state, or a state without actions,
+        # with probability 1. The all-0 policy of a maze walks into a wall
+        # forever, so states that cannot reach such a sink under the current
+        # policy are switched to an action with an outcome one step closer
+        # to a sink. States that cannot reach a sink under any policy keep
+        # their action.
+        if self.discount < 1.0:
+            return
+        dijkstra = import_backend("scipy.sparse.csgraph").dijkstra
+        sp = import_backend("scipy.sparse")
+        rows, next_states, _, probs = self.transition_coo()
+        rows, next_states = rows[probs > 0], next_states[probs > 0]
+        states = rows % self.num_states
+        sinks = np.bincount(states, minlength=self.num_states) == 0
+        sinks[[s for s in self.end_states if 0 <= s < self.num_states]] = True
 
-        # Compute the optimal policy using the computed values
+        def sink_distances(on):
+            # Fewest steps to a sink over the transitions in on
+            if not sinks.any():
+                return np.full(self.num_states, np.inf)
+            reverse = sp.csr_matrix((np.ones(on.sum()), (next_states[on], states[on])),
+                                    shape=(self.num_states, self.num_states))
+            return dijkstra(reverse, indices=np.flatnonzero(sinks), min_only=True, unweighted=True)
+
+        pi = np.asarray(self.pi)
+        proper = np.isfinite(sink_distances(rows // self.num_states == pi[states]))
+        distance = sink_distances(np.ones(len(rows), dtype=bool))
+        closer = np.zeros(self.num_actions * self.num_states, dtype=bool)
+        closer[rows[distance[next_states] == distance[states] - 1]] = True
+        best = closer.reshape(self.num_actions, self.num_states).argmax(axis=0)
+        for s in np.flatnonzero(~proper & np.isfinite(distance)).tolist():
+            self.pi[s] = int(best[s])
+
+    def modified_policy_iteration(self):
+        # Modified policy iteration: each improvement is one synchronous
+        # Bellman backup of every state, which also gives the greedy policy,
+        # followed by mpi_sweeps in-place sweeps evaluating that policy.
+        # Stops on the span of the backup's change (see span_converged).
+        end_states = set(self.end_states)
+        improvements = sweeps = 0
+        while True:
+            V = list(self.V)
+            for s in range(self.num_states):
+                if s not in end_states:
+                    q = [self.q_value(s, a) for a in range(self.num_actions)]
+                    self.pi[s] = max(range(self.num_actions), key=q.__getitem__)
+                    V[s] = q[self.pi[s]]
+            diff = [v - v_old for v, v_old in zip(V, self.V)]
+            self.V = V
+            improvements += 1
+            if self.hooks:
+                self.trace("improvement", improvements, delta=np.ptp(diff),
+                           q_evaluations=(self.num_states - len(end_states)) * self.num_actions)
+            if self.span_converged(diff):
+                break
+            for _ in range(self.mpi_sweeps):
+                for s in range(self.num_states):
+                    if s not in end_states:
+                        self.V[s] = self.q_value(s, self.pi[s])
+                sweeps += 1
+        shift = self.span_shift(diff)
+        self.V = [0.0 if s in end_states else v + shift for s, v in enumerate(self.V)]
+        self.stats["policy_iterations"] = improvements
+        self.stats["sweeps"] = improvements + sweeps
+
+    def sor_value_iteration(self):
+        # Gauss-Seidel value iteration with successive over-relaxation: states
+        # are backed up in place, each moving omega times its Bellman change.
+        # Stops on the span of a sweep's changes, then one synchronous backup
+        # gives the final values.
+        check_omega(self.omega, self.discount)
+        end_states = set(self.end_states)
+        sweeps = 0
+        while True:
+            diff = [0.0] * self.num_states
+            for s in range(self.num_states):
+                if s not in end_states:
+                    diff[s] = self.omega * (self.bellman_backup(s) - self.V[s])
+                    self.V[s] += diff[s]
+            sweeps += 1
+            if self.hooks:
+                self.trace("sweep", sweeps, delta=np.ptp(diff),
+                           q_evaluations=(self.num_states - len(end_states)) * self.num_actions)
+            if self.span_converged(diff):
+                break
+            self.check_sor_progress(sweeps, diff)
+        V = [0.0 if s in end_states else self.bellman_backup(s) for s in range(self.num_states)]
+        shift = self.span_shift([v - v_old for v, v_old in zip(V, self.V)])
+        self.V = [0.0 if s in end_states else v + shift for s, v in enumerate(V)]
+        self.stats["sweeps"] = sweeps + 1
         self.compute_optimal_policy()
 
+    def check_sor_progress(self, sweeps, diff):
+        # Raise instead of sweeping forever, e.g. undiscounted with states
+        # that never reach an end state
+        if not np.all(np.isfinite(diff)):
+            raise RuntimeError(f"sor diverged after {sweeps} sweeps (omega {self.omega})")
+        if sweeps >= self.max_sweeps:
+            raise RuntimeError(f"sor did not converge in {sweeps} sweeps (omega {self.omega}, "
+                               f"last span of changes {np.ptp(diff):.3g})")
+
+    def value_tolerance(self):
+        # Bellman error at which vi and psvi stop. |V - V*| is at most
+        # |T V - V| / (1 - gamma), so with gamma < 1 an error below
+        # epsilon * (1 - gamma) keeps V within epsilon of V*.
+        return self.epsilon * (1.0 - self.discount) if self.discount < 1.0 else self.epsilon
+
+    def span_converged(self, diff):
+        # Stopping rule on the span seminorm max(diff) - min(diff) of a
+        # change diff = T V - V, which unlike the largest change ignores a
+        # shift common to all states. With gamma < 1, V* lies between
+        # T V + c * min(diff) and T V + c * max(diff) for c = gamma / (1 - gamma)
+        # (MacQueen's bounds, end states having diff 0), so stop when half
+        # that interval is below epsilon. Undiscounted MDPs have no such
+        # bounds and stop on the largest change.
+        if self.discount < 1.0:
+            return np.ptp(diff) * self.discount / (1.0 - self.discount) < 2 * self.epsilon
+        return np.abs(diff).max(initial=0.0) < self.epsilon
+
+    def span_shift(self, diff):
+        # Shift taking T V to the middle of MacQueen's bounds
+        if self.discount < 1.0:
+            return (np.max(diff) + np.min(diff)) / 2 * self.discount / (1.0 - self.discount)
+        return 0.0
+
+    def prioritized_sweeping(self, states=None, max_affected=None):
+        # Asynchronous value iteration that always backs up the state with
+        # the largest Bellman error, until every error is below
+        # value_tolerance(). A state's priority is an upper bound on its
+        # Bellman error: after V[s] moves by delta, the error of each
+        # predecessor p can grow by at most gamma * P(p -> s) * delta.
+        # Given states, V is taken to be converged everywhere else and only
+        # their errors are seeded, which is how update() re-plans. Returns
+        # the states whose Q-values may have changed, or None as soon as
+        # there are more than max_affected of them.
+        tolerance = self.value_tolerance()
+        predecessors = self.predecessor_lists()
+        end_states = set(self.end_states)
+        priority = [0.0] * self.num_states
+        queue = []
+        backups = 0
+        affected = set(range(self.num_states) if states is None else states)
+
+        for s in affected:
+            if s not in end_states:
+                priority[s] = abs(self.bellman_backup(s) - self.V[s])
+                backups += 1
+                if priority[s] >= tolerance:
+                    queue.append((-priority[s], s))
+        heapq.heapify(queue)
+
+        while queue:
+            error, s = heapq.heappop(queue)
+            if -error != priority[s]:
+                continue  # superseded by a later push
+            v = self.bellman_backup(s)
+            delta = abs(v - self.V[s])
+            self.V[s] = v
+            priority[s] = 0.0
+            backups += 1
+            if self.hooks and backups % self.num_states == 0:
+                # One record per num_states backups, with the largest
+                # remaining error bound as the delta
+                self.trace("backups", backups // self.num_states,
+                           delta=max(priority),
+                           q_evaluations=self.num_states * self.num_actions)
+            for p, weight in predecessors[s]:
+                if p not in end_states:
+                    if delta > 0.0:
+                        affected.add(p)
+                    priority[p] += self.discount * weight * delta
+                    if priority[p] >= tolerance:
+                        heapq.heappush(queue, (-priority[p], p))
+            if max_affected is not None and len(affected) > max_affected:
+                self.stats["backups"] = backups
+                return None
+
+        self.stats["backups"] = backups
+        if states is None:
+            self.compute_optimal_policy()
+        return affected
+
+    def update(self, transitions, removed=None):
+        # Incremental re-planning: replace the outcomes of every (s, a) pair
+        # in a (5, k) transitions array, as produced by parse_mdp_file, and
+        # delete the (s, a) pairs in removed, a (2, m) array of states and
+        # actions (deletions are applied first), then re-converge V and pi
+        # from their current values. Only the changed states are backed up at
+        # first and the changes spread through the predecessor graph, so a
+        # small edit to a solved MDP costs far less than a cold solve.
+        # Returns the number of backups.
+        self.algorithm, self.solve_start = "update", time.perf_counter()
+        changed = self.apply_update(transitions, removed)
+        affected = self.prioritized_sweeping(changed, max_affected=self.num_states // 4)
+        if affected is None:
+            # The change has reached most states, which Gauss-Seidel sweeps
+            # from the current values back up for less than the heap does
+            backups = self.stats["backups"]
+            self.value_iteration()
+            self.stats["backups"] += backups
+        else:
+            end_states = set(self.end_states)
+            for s in affected:
+                if s not in end_states:
+                    self.pi[s] = self.best_action(s)
+        if self.hooks:
+            self.trace("done", 1)
+        return self.stats["backups"]
+
+    def apply_update(self, transitions, removed=None):
+        # Delete the removed (s, a) pairs, replace the outcome lists of the
+        # given ones and patch the cached predecessor lists of the successors
+        # of the changed states. Returns the changed states.
+        outcomes = {}
+        for s1, a, s2, r, p in transitions.T.tolist():
+            outcomes.setdefault((int(s1), int(a)), []).append((int(s2), r, p))
+        deleted = [] if removed is None else [(int(s), int(a)) for s, a in np.asarray(removed).T.tolist()]
+        states = sorted({s for s, a in outcomes} | {s for s, a in deleted})
+        old_successors = {s: self.successor_weights(s).keys() for s in states}
+        for key in deleted:
+            self.transitions.pop(key, None)
+        self.transitions.update(outcomes)
+        if self.predecessor_cache is not None:
+            for s in states:
+                weights = self.successor_weights(s)
+                for s2 in old_successors[s] | weights.keys():
+                    entries = [(q, w) for q, w in self.predecessor_cache[s2] if q != s]
+                    if s2 in weights:
+                        entries.append((s, weights[s2]))
+                    self.predecessor_cache[s2] = entries
+        return states
+
+    def successor_weights(self, s):
+        # The largest probability of moving from s to each successor
+        weights = {}
+        for a in range(self.num_actions):
+            for s2, r, p in self.transitions.get((s, a), []):
+                if p > weights.get(s2, 0.0):
+                    weights[s2] = p
+        return weights
+
+    def predecessor_lists(self):
+        if self.predecessor_cache is None:
+            self.predecessor_cache = self.predecessors()
+        return self.predecessor_cache
+
+    def predecessors(self):
+        # For every state s2, the (s, weight) pairs of states that can move
+        # into it, weighted by the largest probability of doing so
+        weights = [{} for _ in range(self.num_states)]
+        for (s, a), outcomes in self.transitions.items():
+            for s2, r, p in outcomes:
+                if p > weights[s2].get(s, 0.0):
+                    weights[s2][s] = p
+        return [list(w.items()) for w in weights]
+
     def policy_evaluation(self):
-        epsilon = 1e-6
+        sweeps = 0
         while True:
             delta = 0.0
+            evaluated = 0
             for s in range(self.num_states):
                 if s not in self.end_states:
                     v = self.V[s]
                     self.V[s] = self.q_value(s, self.pi[s])
                     delta = max(delta, abs(self.V[s] - v))
-            if delta < epsilon:
+                    evaluated += 1
+            sweeps += 1
+            if self.hooks:
+                self.trace("evaluation", sweeps, delta=delta, q_evaluations=evaluated)
+            if delta < self.epsilon:
                 break
 
     def q_value(self, s, a):
@@ -103,6 +592,10 @@ class MDP:
             q += p * (r + self.discount * self.V[s2])
         return q
 
+    def bellman_backup(self, s):
+        # One-step lookahead value of state s under the greedy action
+        return max(self.q_value(s, a) for a in range(self.num_actions))
+
     def best_action(self, s):
         # Find the best action for state s
         best_a, best_q = None, float('-inf')
@@ -119,35 +612,809 @@ class MDP:
             if s not in self.end_states:
                 self.pi[s] = self.best_action(s)
 
+    def add_hook(self, hook):
+        # Call hook(record) after every sweep, policy evaluation sweep and
+        # policy improvement step of the solvers, and once when a solve
+        # finishes. A record is a dict with the algorithm, the phase, its
+        # iteration number, the largest change in V (delta), the seconds
+        # since the solve started, the number of policy switches and of
+        # Q-value evaluations of that step. Without hooks nothing is recorded.
+        self.hooks.append(hook)
+
+    def trace(self, phase, iteration, delta=None, policy_switches=None, q_evaluations=0):
+        record = {"algorithm": self.algorithm, "phase": phase, "iteration": iteration,
+                  "delta": None if delta is None else float(delta),
+                  "elapsed": time.perf_counter() - self.solve_start,
+                  "policy_switches": policy_switches, "q_evaluations": q_evaluations}
+        for hook in self.hooks:
+            hook(record)
+
     def solve(self, algorithm):
+        self.algorithm, self.solve_start = algorithm, time.perf_counter()
+        self.run_algorithm(algorithm)
+        if self.hooks:
+            self.trace("done", 1)
+
+    def run_algorithm(self, algorithm):
         if algorithm == 'vi':
             self.value_iteration()
         elif algorithm == 'hpi':
             self.howards_policy_iteration()
         elif algorithm == 'lp':
             self.linear_programming()
+        elif algorithm == 'psvi':
+            self.prioritized_sweeping()
+        elif algorithm == 'mpi':
+            self.modified_policy_iteration()
+        elif algorithm == 'sor':
+            self.sor_value_iteration()
         else:
-            print("Invalid algorithm selected. Please choose one of 'vi', 'hpi', or 'lp'.")
+            raise ValueError(f"Invalid algorithm {algorithm!r} for this backend. Please choose one of "
+                             "'vi', 'hpi', 'lp', 'psvi', 'mpi' or 'sor'.")
 
-    def print_results(self):
+    def print_results(self, file=None):
         # Print the results in the desired format
         for s in range(self.num_states):
             v_star, pi_star = self.V[s], self.pi[s]
-            print(f"{v_star:.6f}\t{pi_star}")
+            print(f"{v_star:.6f}\t{pi_star}", file=file)
+
+    def print_stats(self, file=sys.stderr):
+        for key, value in self.stats.items():
+            print(f"{key}: {value}", file=file)
+
+def attach_shared(blocks, name):
+    from multiprocessing import shared_memory
+    shm_name, shape, dtype = blocks[name]
+    shm = shared_memory.SharedMemory(name=shm_name)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+def parallel_vi_worker(blocks, lo, hi, worker, num_states, num_actions, discount, epsilon, barrier):
+    # Jacobi value iteration over the states [lo, hi). V is double buffered:
+    # sweep k reads values[k % 2] and writes values[(k + 1) % 2], and the
+    # per-worker deltas are double buffered the same way, so one barrier per
+    # sweep is the only synchronisation.
+    sp = import_backend("scipy.sparse")
+    shms, arrays = [], {}
+    for name in blocks:
+        shm, arrays[name] = attach_shared(blocks, name)
+        shms.append(shm)
+    indptr, indices, data = arrays["indptr"], arrays["indices"], arrays["data"]
+    values, deltas, sweeps = arrays["values"], arrays["deltas"], arrays["sweeps"]
+    keep = ~arrays["end_mask"][lo:hi]
+
+    # Per-action CSR views of this shard's rows, sharing the matrix buffers
+    blocks_by_action = []
+    for a in range(num_actions):
+        r0, r1 = a * num_states + lo, a * num_states + hi
+        p0, p1 = indptr[r0], indptr[r1]
+        block = sp.csr_matrix((data[p0:p1], indices[p0:p1], indptr[r0:r1 + 1] - p0),
+                              shape=(hi - lo, num_states))
+        blocks_by_action.append((block, arrays["R"][r0:r1]))
+
+    k = 0
+    while True:
+        current, following = values[k % 2], values[(k + 1) % 2]
+        v = np.full(hi - lo, -np.inf)
+        for block, R in blocks_by_action:
+            np.maximum(v, R + discount * (block @ current), out=v)
+        v = np.where(keep, v, 0.0)
+        deltas[k % 2, worker] = np.abs(v - current[lo:hi]).max(initial=0.0)
+        following[lo:hi] = v
+        try:
+            barrier.wait()
+        except threading.BrokenBarrierError:
+            # The parent aborted the barrier because another worker failed
+            break
+        k += 1
+        if deltas[(k - 1) % 2].max() < epsilon:
+            break
+
+    if worker == 0:
+        sweeps[0] = k
+    del indptr, indices, data, values, deltas, sweeps, arrays, blocks_by_action, current, following
+    for shm in shms:
+        shm.close()
+
+def row_slots(starts, counts):
+    # Positions of the slices [start, start + count) of a CSR matrix's
+    # entries, one slice per row, concatenated
+    offsets = np.cumsum(counts) - counts
+    return np.arange(counts.sum()) - np.repeat(offsets - starts, counts)
+
+class SparseMDP(MDP):
+    # All (s, a) rows are stacked into one CSR matrix, row a * num_states + s
+    # holding the next-state distribution, with the expected reward of each
+    # row kept alongside so a full Bellman backup is one sparse product.
+    # evaluation="exact" solves (I - gamma * P_pi) V = R_pi by BiCGSTAB and
+    # falls back to the sweeps when that does not converge
+
+    # Synchronous sweeps converge more slowly than the in-place sweeps of
+    # MDP, so a tighter threshold keeps the values within 1e-6 of V*.
+    epsilon = 1e-10
+
+    def value_tolerance(self):
+        # epsilon is already tight enough for psvi
+        return self.epsilon
+
+    def __init__(self, mdp_file=None, evaluation="iterative", use_cache=False, workers=None, arrays=None,
+                 mpi_sweeps=5, omega=1.0):
+        self.evaluation = evaluation
+        self.workers = workers or os.cpu_count()
+        super().__init__(mdp_file, use_cache=use_cache, arrays=arrays, mpi_sweeps=mpi_sweeps, omega=omega)
+
+    def load_arrays(self, header, transitions):
+        # The transition arrays go straight into sparse matrices, without
+        # building the per-(s, a) dict of the base class
+        self.load_header(header)
+        self.build_sparse(transitions)
+
+    def build_sparse(self, transitions):
+        # COO arrays of (row, s2, r, p), one entry per transition, in row
+        # order, so that the entries of each row are one slice of the arrays
+        s1, a, s2, r, p = transitions
+        rows = a.astype(np.int64) * self.num_states + s1.astype(np.int64)
+        order = np.argsort(rows, kind="stable")
+        self.t_row = rows[order]
+        self.t_next = s2.astype(np.int64)[order]
+        self.t_reward = np.asarray(r, dtype=float)[order]
+        self.t_prob = np.asarray(p, dtype=float)[order]
+        self.build_matrices()
+        self.predecessor_cache = None
+        # predecessors_of(), kept across update() calls
+        self.predecessor_matrix = None
+
+        self.end_mask = np.zeros(self.num_states, dtype=bool)
+        self.end_mask[[s for s in self.end_states if 0 <= s < self.num_states]] = True
+
+        self.reset()
+
+    def build_matrices(self):
+        # P and R from the COO arrays. P takes their order as is, so the
+        # entries of row r are t_next and t_prob[P.indptr[r]:P.indptr[r + 1]]
+        # (parallel transitions stay separate entries, which products sum).
+        sp = import_backend("scipy.sparse")
+        num_rows = self.num_actions * self.num_states
+        indptr = np.concatenate([[0], np.cumsum(np.bincount(self.t_row, minlength=num_rows))])
+        self.P = sp.csr_matrix((self.t_prob.copy(), self.t_next.copy(), indptr),
+                               shape=(num_rows, self.num_states))
+        self.R = np.bincount(self.t_row, weights=self.t_prob * self.t_reward,
+                             minlength=num_rows)
+
+    def reset(self):
+        self.V = np.zeros(self.num_states)
+        self.pi = np.zeros(self.num_states, dtype=np.int64)
+        self.stats = {}
+
+    def warm_start(self, V, pi):
+        self.V = np.array(V, dtype=float)
+        self.pi = np.array(pi, dtype=np.int64)
+
+    def update(self, transitions, removed=None):
+        # Incremental re-planning as in MDP.update, with vectorised sweeps
+        # over a frontier of states in place of one heap-ordered backup at a
+        # time. The first frontier is the changed states, and each sweep's
+        # states whose value moved by epsilon or more pass the frontier on
+        # to their predecessors. The other states keep their values. Once
+        # the frontier holds most states, plain value iteration sweeps from
+        # the current values finish the job for less.
+        self.algorithm, self.solve_start = "update", time.perf_counter()
+        changed = np.asarray(self.apply_update(transitions, removed), dtype=np.int64)
+        touched = np.zeros(self.num_states, dtype=bool)
+        frontier = changed[~self.end_mask[changed]]
+        sweeps = backups = 0
+        while frontier.size:
+            if 4 * frontier.size > self.num_states:
+                full_sweeps = self.sweep_to_convergence(sweeps) - sweeps
+                sweeps += full_sweeps
+                backups += full_sweeps * int((~self.end_mask).sum())
+                touched[~self.end_mask] = True
+                break
+            touched[frontier] = True
+            v = self.frontier_q_values(frontier).max(axis=0)
+            delta = np.abs(v - self.V[frontier])
+            self.V[frontier] = v
+            sweeps += 1
+            backups += frontier.size
+            if self.hooks:
+                self.trace("sweep", sweeps, delta=delta.max(),
+                           q_evaluations=self.num_actions * frontier.size)
+            frontier = self.predecessors_of(frontier[delta >= self.epsilon])
+            frontier = frontier[~self.end_mask[frontier]]
+
+        # Every state whose Q-values may have changed has been backed up
+        touched = np.flatnonzero(touched)
+        self.pi[touched] = self.frontier_q_values(touched).argmax(axis=0)
+        self.stats["sweeps"] = sweeps
+        self.stats["backups"] = backups
+        if self.hooks:
+            self.trace("done", 1)
+        return backups
+
+    def predecessors_of(self, states):
+        # The states with a transition into any of the given states, read off
+        # a predecessor matrix built once and the edges that update() added
+        # since. Edges that update() took away are kept, which only costs
+        # extra backups, and the matrix is rebuilt once the added edges
+        # outnumber a quarter of the transitions.
+        if self.predecessor_matrix is None:
+            sp = import_backend("scipy.sparse")
+            self.predecessor_matrix = sp.csr_matrix(
+                (np.ones(len(self.t_row), dtype=bool), (self.t_next, self.t_row % self.num_states)),
+                shape=(self.num_states, self.num_states))
+            self.added_edges = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+        indptr = self.predecessor_matrix.indptr.astype(np.int64)
+        found = self.predecessor_matrix.indices[row_slots(indptr[states], indptr[states + 1] - indptr[states])]
+        added_next, added_states = self.added_edges
+        if added_next.size:
+            found = np.concatenate([found, added_states[np.isin(added_next, states)]])
+        return np.unique(found)
+
+    def frontier_q_values(self, states):
+        # Q-values of the given states only, shape (num_actions, len(states)),
+        # from their rows' slices of P's arrays. Gathering the rows costs more
+        # than the product itself, so for a large share of the states all
+        # Q-values are computed instead.
+        if 4 * len(states) > self.num_states:
+            return self.q_values()[:, states]
+        rows = (np.arange(self.num_actions)[:, None] * self.num_states + states).ravel()
+        indptr = self.P.indptr.astype(np.int64)
+        counts = indptr[rows + 1] - indptr[rows]
+        slots = row_slots(indptr[rows], counts)
+        expected = np.bincount(np.repeat(np.arange(len(rows)), counts),
+                               weights=self.P.data[slots] * self.V[self.P.indices[slots]], minlength=len(rows))
+        q = self.R[rows] + self.discount * expected
+        return q.reshape(self.num_actions, len(states))
+
+    def apply_update(self, transitions, removed=None):
+        # Delete the removed (s, a) rows and replace the entries of the given
+        # ones, patching P, R and the predecessor edges instead of rebuilding
+        # them. If every changed row keeps its number of entries, they are
+        # overwritten in their slices of the arrays, which costs O(k) for k
+        # changed entries. Otherwise the arrays are spliced, a copy of each
+        # but no sort. Returns the changed states.
+        s1, a, s2, r, p = transitions
+        new_rows = a.astype(np.int64) * self.num_states + s1.astype(np.int64)
+        order = np.argsort(new_rows, kind="stable")
+        new_rows, s2 = new_rows[order], s2.astype(np.int64)[order]
+        r, p = np.asarray(r, dtype=float)[order], np.asarray(p, dtype=float)[order]
+        rows = np.unique(new_rows)
+        if removed is not None:
+            removed = np.asarray(removed, dtype=np.int64)
+            rows = np.union1d(rows, removed[1] * self.num_states + removed[0])
+
+        indptr = self.P.indptr.astype(np.int64)
+        starts, old_counts = indptr[rows], indptr[rows + 1] - indptr[rows]
+        counts = np.bincount(np.searchsorted(rows, new_rows), minlength=len(rows))
+        if np.array_equal(counts, old_counts):
+            slots = row_slots(starts, counts)
+            self.t_next[slots] = s2
+            self.t_reward[slots] = r
+            self.t_prob[slots] = p
+            self.P.indices[slots] = s2
+            self.P.data[slots] = p
+            self.R[rows] = 0.0
+            np.add.at(self.R, new_rows, p * r)
+        else:
+            kept = np.ones(len(self.t_row), dtype=bool)
+            kept[row_slots(starts, old_counts)] = False
+            # Where each row's new entries go among the kept ones
+            at = np.repeat(starts - (np.cumsum(old_counts) - old_counts), counts)
+            self.t_row = np.insert(self.t_row[kept], at, new_rows)
+            self.t_next = np.insert(self.t_next[kept], at, s2)
+            self.t_reward = np.insert(self.t_reward[kept], at, r)
+            self.t_prob = np.insert(self.t_prob[kept], at, p)
+            self.build_matrices()
+
+        self.predecessor_cache = None
+        if self.predecessor_matrix is not None:
+            added_next, added_states = self.added_edges
+            self.added_edges = (np.concatenate([added_next, s2]),
+                                np.concatenate([added_states, new_rows % self.num_states]))
+            if 4 * len(self.added_edges[0]) > len(self.t_row):
+                self.predecessor_matrix = None
+        return np.unique(rows % self.num_states)
+
+    def q_values(self):
+        # Q-values of every action in every state, shape (num_actions, num_states)
+        q = self.R + self.discount * (self.P @ self.V)
+        return q.reshape(self.num_actions, self.num_states)
+
+    def policy_rows(self):
+        # Rows of P and R selected by the current policy
+        return self.pi * self.num_states + np.arange(self.num_states)
+
+    def value_iteration(self):
+        sweeps = self.sweep_to_convergence()
+        self.stats["sweeps"] = sweeps
+        self.stats["backups"] = sweeps * int((~self.end_mask).sum())
+
+        self.compute_optimal_policy()
+
+    def sweep_to_convergence(self, sweeps=0):
+        # Synchronous Bellman sweeps of every state from the current values
+        # until V moves by less than epsilon, counting on from sweeps.
+        # Returns the sweep count.
+        while True:
+            v = self.q_values().max(axis=0)
+            v[self.end_mask] = 0.0
+            delta = np.abs(v - self.V).max(initial=0.0)
+            self.V = v
+            sweeps += 1
+            if self.hooks:
+                self.trace("sweep", sweeps, delta=delta,
+                           q_evaluations=self.num_actions * self.num_states)
+            if delta < self.epsilon:
+                return sweeps
+
+    def modified_policy_iteration(self):
+        improvements = sweeps = 0
+        while True:
+            q = self.q_values()
+            self.pi = np.where(self.end_mask, self.pi, q.argmax(axis=0))
+            v = np.where(self.end_mask, 0.0, q.max(axis=0))
+            diff = v - self.V
+            self.V = v
+            improvements += 1
+            if self.hooks:
+                self.trace("improvement", improvements, delta=np.ptp(diff),
+                           q_evaluations=self.num_actions * self.num_states)
+            if self.span_converged(diff):
+                break
+            rows = self.policy_rows()
+            P_pi, R_pi = self.P[rows], self.R[rows]
+            for _ in range(self.mpi_sweeps):
+                self.V = np.where(self.end_mask, 0.0, R_pi + self.discount * (P_pi @ self.V))
+                sweeps += 1
+        self.V = np.where(self.end_mask, 0.0, self.V + self.span_shift(diff))
+        self.stats["policy_iterations"] = improvements
+        self.stats["sweeps"] = improvements + sweeps
+
+    def sor_value_iteration(self):
+        # Gauss-Seidel needs the state by state order, so the sparse backend
+        # over-relaxes its synchronous sweeps instead:
+        # V <- V + omega * (T V - V), which converges for omega < 2 / (1 + gamma)
+        check_omega(self.omega, self.discount)
+        sweeps = 0
+        while True:
+            diff = self.omega * (np.where(self.end_mask, 0.0, self.q_values().max(axis=0)) - self.V)
+            self.V = self.V + diff
+            sweeps += 1
+            if self.hooks:
+                self.trace("sweep", sweeps, delta=np.ptp(diff),
+                           q_evaluations=self.num_actions * self.num_states)
+            if self.span_converged(diff):
+                break
+            self.check_sor_progress(sweeps, diff)
+        v = np.where(self.end_mask, 0.0, self.q_values().max(axis=0))
+        self.V = np.where(self.end_mask, 0.0, v + self.span_shift(v - self.V))
+        self.stats["sweeps"] = sweeps + 1
+        self.compute_optimal_policy()
+
+    def parallel_value_iteration(self):
+        # Jacobi value iteration with the states split into contiguous shards,
+        # one per worker process. The CSR arrays and V live in shared memory,
+        # so nothing is pickled after the workers start.
+        from multiprocessing import shared_memory
+        if multiprocessing.current_process().daemon:
+            # Daemonic processes, such as the workers of a multiprocessing
+            # pool (planner.py --batch --processes, VerifyAll.py), cannot
+            # start processes of their own, so run the same sweeps serially
+            self.stats["workers"] = "0 (in a daemonic process, ran serial vi)"
+            self.value_iteration()
+            return
+        workers = max(1, min(self.workers, self.num_states))
+        arrays = {
+            "indptr": self.P.indptr.astype(np.int64),
+            "indices": self.P.indices.astype(np.int64),
+            "data": self.P.data,
+            "R": self.R,
+            "end_mask": self.end_mask,
+            "values": np.stack([self.V, self.V]),
+            "deltas": np.zeros((2, workers)),
+            "sweeps": np.zeros(1, dtype=np.int64),
+        }
+        shms, blocks = {}, {}
+        try:
+            for name, array in arrays.items():
+                shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+                shms[name] = shm
+                np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+                blocks[name] = (shm.name, array.shape, array.dtype)
+
+            barrier = multiprocessing.Barrier(workers)
+            bounds = np.linspace(0, self.num_states, workers + 1).astype(int)
+            processes = [
+                multiprocessing.Process(
+                    target=parallel_vi_worker,
+                    args=(blocks, bounds[w], bounds[w + 1], w, self.num_states,
+                          self.num_actions, self.discount, self.epsilon, barrier))
+                for w in range(workers)
+            ]
+            for process in processes:
+                process.start()
+            # Wait for the workers as they exit. A worker that fails never
+            # reaches the barrier again, so the barrier is aborted to release
+            # the others instead of leaving them waiting forever.
+            running = {process.sentinel: process for process in processes}
+            while running:
+                for sentinel in multiprocessing.connection.wait(list(running)):
+                    process = running.pop(sentinel)
+                    process.join()
+                    if process.exitcode != 0:
+                        barrier.abort()
+            if any(process.exitcode != 0 for process in processes):
+                raise RuntimeError("A parallel value iteration worker failed")
+
+            sweeps = int(np.ndarray(1, dtype=np.int64, buffer=shms["sweeps"].buf)[0])
+            values = np.ndarray((2, self.num_states), buffer=shms["values"].buf)
+            self.V = values[sweeps % 2].copy()
+            del values
+        finally:
+            for shm in shms.values():
+                shm.close()
+                shm.unlink()
+
+        self.stats["sweeps"] = sweeps
+        self.stats["workers"] = workers
+        self.compute_optimal_policy()
+
+    def run_algorithm(self, algorithm):
+        if algorithm == 'pvi':
+            self.parallel_value_iteration()
+        elif algorithm == 'sp':
+            self.shortest_path()
+        else:
+            super().run_algorithm(algorithm)
+
+    def shortest_path_kind(self):
+        # Classify the MDP for the shortest-path fast path: "bfs" if every
+        # action is deterministic with the same non-positive reward,
+        # "dijkstra" if it is deterministic, undiscounted and has only
+        # non-positive rewards, otherwise None. Each non-end state must have
+        # either every action or none, since a missing action has value 0.
+        live = ~self.end_mask[self.t_row % self.num_states]
+        rows_per_state = np.bincount(self.t_row[live] % self.num_states, minlength=self.num_states)
+        row_counts = np.bincount(self.t_row[live], minlength=self.num_actions * self.num_states)
+        rewards = self.t_reward[live]
+        if not (np.all(self.t_prob[live] == 1.0) and row_counts.max(initial=0) <= 1
+                and np.all((rows_per_state == 0) | (rows_per_state == self.num_actions))
+                and np.all(rewards <= 0)):
+            return None
+        if rewards.size == 0 or np.all(rewards == rewards[0]):
+            return "bfs"
+        if self.discount == 1.0:
+            return "dijkstra"
+        return None
+
+    def shortest_path(self):
+        # Solve a deterministic shortest-path MDP with a multi-source search
+        # from the end states over the reversed transition graph, falling
+        # back to value iteration for any other MDP. States without any
+        # transitions have value 0, like end states, so they are sources too.
+        kind = self.shortest_path_kind()
+        self.stats["shortest_path"] = kind or "not applicable, used vi"
+        if kind is None:
+            self.value_iteration()
+            return
+
+        sp = import_backend("scipy.sparse")
+        dijkstra = import_backend("scipy.sparse.csgraph").dijkstra
+        has_actions = np.bincount(self.t_row % self.num_states, minlength=self.num_states) > 0
+        sources = np.flatnonzero(self.end_mask | ~has_actions)
+        live = ~self.end_mask[self.t_row % self.num_states]
+        states, next_states = self.t_row[live] % self.num_states, self.t_next[live]
+        costs = -self.t_reward[live]
+        # Keep the cheapest of parallel edges, which csr_matrix would sum
+        keys = next_states * self.num_states + states
+        order = np.lexsort((costs, keys))
+        keys, first = np.unique(keys[order], return_index=True)
+        edge_costs = costs[order][first]
+        reverse = sp.csr_matrix((edge_costs, (keys // self.num_states, keys % self.num_states)),
+                                shape=(self.num_states, self.num_states))
+
+        self.V = np.zeros(self.num_states)
+        if sources.size:
+            distance = dijkstra(reverse, indices=sources, min_only=True, unweighted=(kind == "bfs"))
+        else:
+            distance = np.full(self.num_states, np.inf)
+        if kind == "bfs":
+            # k steps of reward r are worth r * (1 + gamma + ... + gamma^(k-1))
+            r = -costs[0] if costs.size else 0.0
+            if self.discount < 1.0:
+                self.V = r * (1.0 - self.discount ** distance) / (1.0 - self.discount)
+            else:
+                self.V = r * distance
+        else:
+            self.V = -distance
+        self.V[self.end_mask | ~has_actions] = 0.0
+        self.V = np.nan_to_num(self.V, nan=0.0)
+
+        # The greedy policy is taken from the distances rather than from V,
+        # whose discounted values of far states can round to the same float
+        step = np.ones_like(self.t_reward) if kind == "bfs" else -self.t_reward
+        to_go = np.full(self.num_actions * self.num_states, np.inf)
+        to_go[self.t_row] = step + distance[self.t_next]
+        best = to_go.reshape(self.num_actions, self.num_states).argmin(axis=0)
+        self.pi = np.where(self.end_mask | ~has_actions, self.pi, best)
+
+    def howards_policy_iteration(self):
+        self.make_policy_proper()
+        self.stats["policy_iterations"] = 0
+        while True:
+            self.policy_evaluation()
+            self.stats["policy_iterations"] += 1
+            q = self.q_values()
+            improved = q.argmax(axis=0)
+            # Only switch where the gain is real, so that round-off in the
+            # values cannot make the policy cycle between tied actions
+            states = np.arange(self.num_states)
+            gain = q[improved, states] - q[self.pi, states]
+            improved = np.where((gain > self.epsilon) & ~self.end_mask, improved, self.pi)
+            if self.hooks:
+                self.trace("improvement", self.stats["policy_iterations"],
+                           policy_switches=int((improved != self.pi).sum()),
+                           q_evaluations=self.num_actions * self.num_states)
+            if np.array_equal(improved, self.pi):
+                break
+            self.pi = improved
+
+    def policy_evaluation(self):
+        rows = self.policy_rows()
+        P_pi, R_pi = self.P[rows], self.R[rows]
+        if self.evaluation == "exact":
+            previous = self.V
+            products = self.solve_policy_values(P_pi, R_pi)
+            if products is not None:
+                if self.hooks:
+                    self.trace("evaluation", 1, delta=np.abs(self.V - previous).max(initial=0.0),
+                               q_evaluations=products * self.num_states)
+                return
+        sweeps = 0
+        while True:
+            v = R_pi + self.discount * (P_pi @ self.V)
+            v[self.end_mask] = 0.0
+            delta = np.abs(v - self.V).max(initial=0.0)
+            self.V = v
+            sweeps += 1
+            if self.hooks:
+                self.trace("evaluation", sweeps, delta=delta, q_evaluations=self.num_states)
+            if delta < self.epsilon:
+                break
+
+    def solve_policy_values(self, P_pi, R_pi):
+        # Solve (I - gamma * P_pi) V = R_pi by BiCGSTAB from the current V,
+        # with the rows of end states replaced by V[s] = 0. A sparse LU
+        # factorisation fills in on the random transition graphs of generated
+        # MDPs, while a Krylov solver only needs products with the matrix,
+        # each as costly as one evaluation sweep. It stops at the residual
+        # max|R_pi + gamma * P_pi V - V| < epsilon, where the sweeps stop.
+        # Returns the number of products, or None if the solver did not get
+        # there (e.g. gamma = 1 and the policy never reaches an end state).
+        sp = import_backend("scipy.sparse")
+        linalg = import_backend("scipy.sparse.linalg")
+        keep = sp.diags((~self.end_mask).astype(float))
+        A = sp.identity(self.num_states, format="csr") - self.discount * (keep @ P_pi)
+        b = np.where(self.end_mask, 0.0, R_pi)
+        products = 0
+
+        def matvec(v):
+            nonlocal products
+            products += 1
+            return A @ v
+
+        operator = linalg.LinearOperator(A.shape, matvec=matvec, dtype=float)
+        v, info = linalg.bicgstab(operator, b, x0=self.V, rtol=0.0, atol=self.epsilon, maxiter=1000)
+        if info != 0 or not np.all(np.isfinite(v)) or np.abs(A @ v - b).max(initial=0.0) >= self.epsilon:
+            return None
+        self.V = v
+        return products
+
+    def transition_coo(self):
+        return self.t_row, self.t_next, self.t_reward, self.t_prob
+
+    def linear_programming(self):
+        self.V = linear_program_values(self.P, self.R, self.end_mask, self.discount, self.stats)
+        self.compute_optimal_policy()
+
+    def q_value(self, s, a):
+        row = a * self.num_states + s
+        return self.R[row] + self.discount * self.P[row].dot(self.V)[0]
+
+    def state_q_values(self, s):
+        # Q-values of every action in state s, read straight from the CSR arrays
+        q = np.empty(self.num_actions)
+        indptr, indices, data = self.P.indptr, self.P.indices, self.P.data
+        for a in range(self.num_actions):
+            row = a * self.num_states + s
+            lo, hi = indptr[row], indptr[row + 1]
+            q[a] = self.R[row] + self.discount * data[lo:hi].dot(self.V[indices[lo:hi]])
+        return q
+
+    def bellman_backup(self, s):
+        return self.state_q_values(s).max()
+
+    def best_action(self, s):
+        return int(self.state_q_values(s).argmax())
+
+    def predecessors(self):
+        # Reduce the transitions to one (s2, s) entry holding the largest
+        # probability over actions, then split by s2
+        states = self.t_row % self.num_states
+        keys = self.t_next * self.num_states + states
+        order = np.argsort(keys, kind="stable")
+        keys, first = np.unique(keys[order], return_index=True)
+        weights = np.maximum.reduceat(self.t_prob[order], first) if len(keys) else np.empty(0)
+        predecessors = [[] for _ in range(self.num_states)]
+        for key, weight in zip(keys.tolist(), weights.tolist()):
+            if weight > 0:
+                predecessors[key // self.num_states].append((key % self.num_states, weight))
+        return predecessors
+
+    def compute_optimal_policy(self):
+        best = self.q_values().argmax(axis=0)
+        self.pi = np.where(self.end_mask, self.pi, best)
+
+def load_planner_mdp(mdp_file=None, backend="dict", evaluation="iterative", use_cache=False,
+                     workers=None, arrays=None, mpi_sweeps=5, omega=1.0):
+    # Build the MDP for the chosen backend, from a file or from in-memory
+    # (header, transitions) arrays
+    if backend == "sparse":
+        return SparseMDP(mdp_file, evaluation=evaluation, use_cache=use_cache, workers=workers,
+                         arrays=arrays, mpi_sweeps=mpi_sweeps, omega=omega)
+    return MDP(mdp_file, use_cache=use_cache, arrays=arrays, mpi_sweeps=mpi_sweeps, omega=omega)
+
+def batch_output_path(output_dir, mdp_file, algorithm):
+    stem = os.path.splitext(os.path.basename(mdp_file))[0]
+    return os.path.join(output_dir, f"{stem}-{algorithm}.txt")
+
+def check_algorithms(algorithms, backend):
+    # Raise ValueError for an unknown algorithm, or one the backend lacks
+    for algorithm in algorithms:
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"Invalid algorithm {algorithm!r}, choose from {', '.join(ALGORITHMS)}")
+        if algorithm in SPARSE_ALGORITHMS and backend != "sparse":
+            raise ValueError(f"The {algorithm} algorithm requires --backend sparse")
+
+def plan_file(mdp_file, algorithms, output_dir, options):
+    # Parse one MDP file once and solve it with every algorithm in turn,
+    # writing each value/policy table to its own output file. A failure
+    # ends this file only: it is returned as an error message along with
+    # the timings of the steps that completed.
+    timings = {}
+    try:
+        start = time.perf_counter()
+        mdp = load_planner_mdp(mdp_file, **options)
+        timings["parse"] = time.perf_counter() - start
+        for algorithm in algorithms:
+            mdp.reset()
+            start = time.perf_counter()
+            mdp.solve(algorithm)
+            timings[algorithm] = time.perf_counter() - start
+            with open(batch_output_path(output_dir, mdp_file, algorithm), 'w') as f:
+                mdp.print_results(file=f)
+    except Exception as e:
+        return mdp_file, timings, f"{type(e).__name__}: {e}"
+    return mdp_file, timings, None
+
+def plan_file_job(job):
+    return plan_file(*job)
+
+def plan_batch(patterns, algorithms, output_dir, options, processes=1):
+    # Solve every MDP file matching the glob patterns in this process, or
+    # across a process pool, yielding (mdp_file, timings, error) as files
+    # complete, where error is None for a file solved by every algorithm
+    check_algorithms(algorithms, options.get("backend", "dict"))
+    mdp_files = sorted({f for pattern in patterns for f in glob.glob(pattern)})
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = [(mdp_file, algorithms, output_dir, options) for mdp_file in mdp_files]
+    if processes > 1:
+        with multiprocessing.Pool(processes) as pool:
+            yield from pool.imap_unordered(plan_file_job, jobs)
+    else:
+        for job in jobs:
+            yield plan_file_job(job)
 
 def main():
     parser = argparse.ArgumentParser(description="MDP Planning Algorithms")
     parser.add_argument("--mdp", type=str, help="Path to the input MDP file")
-    parser.add_argument("--algorithm", type=str, choices=["vi", "hpi", "lp"], help="Algorithm to use: vi, hpi, or lp")
+    parser.add_argument("--algorithm", type=str, choices=ALGORITHMS,
+                        help="Algorithm to use: vi, hpi, lp, psvi (prioritized sweeping), "
+                             "mpi (modified policy iteration), sor (value iteration with "
+                             "over-relaxation), pvi (parallel value iteration) or sp "
+                             "(shortest-path search for deterministic MDPs); pvi and sp need "
+                             "the sparse backend")
+    parser.add_argument("--backend", type=str, choices=["dict", "sparse"], default="dict",
+                        help="Transition representation: dict of lists or sparse matrices")
+    parser.add_argument("--evaluation", type=str, choices=["iterative", "exact"], default="iterative",
+                        help="Policy evaluation: iterative sweeps or a sparse linear solve (BiCGSTAB)")
+    parser.add_argument("--mpi-sweeps", type=int, default=5,
+                        help="Policy evaluation sweeps per improvement for mpi")
+    parser.add_argument("--omega", type=relaxation_factor, default=1.0,
+                        help="Relaxation factor for sor (1 is plain Gauss-Seidel), below 2 / (1 + gamma)")
+    parser.add_argument("--cache", action="store_true",
+                        help="Reuse a parsed binary copy of the MDP file stored next to it")
+    parser.add_argument("--stats", action="store_true",
+                        help="Print solver counters and timings to stderr")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Number of worker processes for pvi (default: all CPUs)")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Print the time spent importing backends, parsing and solving to stderr")
+    parser.add_argument("--warm-start", type=str,
+                        help="Start from the values and policy in this planner output file")
+    parser.add_argument("--trace", type=str,
+                        help="Write one JSON record per solver iteration to this .jsonl file")
+    parser.add_argument("--batch", type=str, nargs="+",
+                        help="Solve every MDP file matching these paths or glob patterns")
+    parser.add_argument("--algorithms", type=str, default="vi,hpi,lp",
+                        help="Comma separated algorithms to run on each file in --batch mode")
+    parser.add_argument("--outdir", type=str, default="batch_output",
+                        help="Directory for the per-file outputs of --batch mode")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="Number of MDP files to solve in parallel in --batch mode")
     args = parser.parse_args()
 
+    options = {"backend": args.backend, "evaluation": args.evaluation,
+               "use_cache": args.cache, "workers": args.workers,
+               "mpi_sweeps": args.mpi_sweeps, "omega": args.omega}
+
+    if args.batch:
+        algorithms = args.algorithms.split(",")
+        try:
+            check_algorithms(algorithms, args.backend)
+        except ValueError as e:
+            parser.error(str(e))
+        failed = 0
+        for mdp_file, timings, error in plan_batch(args.batch, algorithms, args.outdir, options, args.processes):
+            line = " ".join([mdp_file] + [f"{name}={t:.4f}s" for name, t in timings.items()])
+            if error is not None:
+                failed += 1
+                line += f" FAILED: {error}"
+            print(line, flush=True)
+        if failed:
+            print(f"{failed} file(s) failed", file=sys.stderr)
+            sys.exit(1)
+        return
+
     if not args.mdp or not args.algorithm:
         print("Both --mdp and --algorithm arguments are required.")
         return
 
-    mdp = MDP(args.mdp)
-    mdp.solve(args.algorithm)
+    if args.evaluation == "exact" and args.backend != "sparse":
+        print("Exact policy evaluation requires --backend sparse.")
+        return
+
+    if args.algorithm in SPARSE_ALGORITHMS and args.backend != "sparse":
+        print("The pvi and sp algorithms require --backend sparse.")
+        return
+
+    start = time.perf_counter()
+    mdp = load_planner_mdp(args.mdp, **options)
+    if args.algorithm == "sor":
+        # The range of omega depends on the discount, read from the file
+        try:
+            check_omega(args.omega, mdp.discount)
+        except ValueError as e:
+            parser.error(str(e))
+    if args.warm_start:
+        mdp.load_value_policy(args.warm_start)
+    loaded = time.perf_counter()
+    if args.trace:
+        with open(args.trace, 'w') as trace_file:
+            mdp.add_hook(lambda record: trace_file.write(json.dumps(record) + "\n"))
+            mdp.solve(args.algorithm)
+    else:
+        mdp.solve(args.algorithm)
+    solved = time.perf_counter()
     mdp.print_results()
+    if args.profile_startup:
+        # Backends imported while loading or solving are counted in those
+        # phases as well as listed on their own
+        for name, seconds in IMPORT_TIMES.items():
+            print(f"import {name}: {seconds * 1000:.1f} ms", file=sys.stderr)
+        print(f"load: {(loaded - start) * 1000:.1f} ms", file=sys.stderr)
+        print(f"solve: {(solved - loaded) * 1000:.1f} ms", file=sys.stderr)
+    if args.stats:
+        mdp.print_stats()
 
 if __name__ == "__main__":
     main()
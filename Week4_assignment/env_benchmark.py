@@ -0,0 +1,75 @@
+import argparse
+import random
+import time
+import numpy as np
+from windy_gridworld_agents import WindyGridworld, q_learning, td_batch
+
+# Steps per second of the windy gridworld environment and of Q-learning on
+# it: tuple states stepped with step() against the integer state tables, and
+# the single-run agent against the batched engine. The "tuple" agent is the
+# Q-learning loop as it was before the tables, with tuple states indexing a
+# NumPy Q array.
+
+def tuple_q_learning(agent, num_episodes, alpha, epsilon, gamma):
+    Q = np.zeros((agent.rows, agent.cols, len(agent.actions)))
+    total_steps = 0
+    for _ in range(num_episodes):
+        state = agent.start_state
+        while state != agent.goal_state:
+            if random.random() < epsilon:
+                action = random.choice(range(len(Q[state])))
+            else:
+                action = np.argmax(Q[state])
+            next_state, reward = agent.step(state, agent.actions[action])
+            Q[state][action] += alpha * (reward + gamma * max(Q[next_state]) - Q[state][action])
+            state = next_state
+            total_steps += 1
+    return total_steps
+
+def report(name, steps, seconds):
+    print(f"{name:<34} {steps:>10d} steps {seconds:8.3f} s {steps / seconds:14,.0f} steps/s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Windy gridworld step rate benchmark")
+    parser.add_argument("--steps", type=int, default=200000, help="Environment steps to time")
+    parser.add_argument("--episodes", type=int, default=200, help="Episodes per Q-learning run")
+    parser.add_argument("--runs", type=int, default=100, help="Runs of the batched engine")
+    args = parser.parse_args()
+
+    agent = WindyGridworld(7, 10, [0, 0, 0, 1, 1, 1, 2, 2, 1, 0])
+    rng = np.random.default_rng(0)
+    states = rng.integers(agent.num_states, size=args.steps).tolist()
+    actions = rng.integers(len(agent.actions), size=args.steps).tolist()
+
+    tuple_states = [(s // agent.cols, s % agent.cols) for s in states]
+    tuple_actions = [agent.actions[a] for a in actions]
+    start = time.perf_counter()
+    for state, action in zip(tuple_states, tuple_actions):
+        agent.step(state, action)
+    report("step() on tuples", args.steps, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for state, action in zip(states, actions):
+        agent.step_index(state, action)
+    report("step_index() on integers", args.steps, time.perf_counter() - start)
+
+    next_list, reward_list = agent.next_list, agent.reward_list
+    start = time.perf_counter()
+    for state, action in zip(states, actions):
+        next_list[0][state][action], reward_list[0][state][action]
+    report("inline table lookup", args.steps, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    steps = tuple_q_learning(agent, args.episodes, 0.1, 0.1, 1.0)
+    report("q_learning, tuples + NumPy Q", steps, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    episode_steps, _ = q_learning(agent, args.episodes, 0.1, 0.1, 1.0)
+    report("q_learning, integer tables", sum(episode_steps), time.perf_counter() - start)
+
+    start = time.perf_counter()
+    episode_steps, _ = td_batch(agent, ["q_learning"], args.runs, args.episodes, 0.1, 0.1, 1.0)
+    report(f"td_batch q_learning, {args.runs} runs", int(episode_steps.sum()), time.perf_counter() - start)
+
+if __name__ == "__main__":
+    main()
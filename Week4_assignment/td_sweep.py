@@ -0,0 +1,153 @@
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import time
+import zlib
+from functools import partial
+import numpy as np
+from windy_gridworld_agents import WindyGridworld, sarsa_zero, expected_sarsa, q_learning
+
+# Hyperparameter sweeps of the windy gridworld TD agents. Every combination of
+# algorithm, alpha, epsilon, gamma, wind ("steady" or "stochastic"), action set
+# ("kings" or "four" moves) and seed is one job, and the jobs run in a process
+# pool. Each job seeds the random generator of the worker running it from its
+# own parameters, so its result does not depend on the worker or the order.
+#
+# Results are appended to the sweep directory as jobs finish: the steps of
+# every episode to steps.bin (int32, one row of num_episodes per job) and then
+# the job's parameters to jobs.jsonl, the record of completed jobs. Running
+# the same sweep again skips the jobs in the record, so an interrupted sweep
+# resumes where it stopped. results.npz gathers the directory into one column
+# per parameter plus the (jobs, episodes) steps matrix.
+
+agents = {"sarsa": sarsa_zero, "expected_sarsa": expected_sarsa, "q_learning": q_learning}
+wind_strength = [0, 0, 0, 1, 1, 1, 2, 2, 1, 0]
+columns = ["algorithm", "alpha", "epsilon", "gamma", "wind", "moves", "seed"]
+
+def job_seed(job):
+    # The seed of the job's parameters without the seed, and the seed itself
+    params = json.dumps(list(job[:-1])).encode()
+    return int(np.random.SeedSequence([zlib.crc32(params), job[-1]]).generate_state(1)[0])
+
+def run_job(job, num_episodes):
+    algorithm, alpha, epsilon, gamma, wind, moves, seed = job
+    random.seed(job_seed(job))
+    agent = WindyGridworld(7, 10, wind_strength, stochastic_wind=wind == "stochastic", king_moves=moves == "kings")
+    start = time.perf_counter()
+    episode_steps, _ = agents[algorithm](agent, num_episodes, alpha, epsilon, gamma)
+    return job, np.array(episode_steps, dtype=np.int32), time.perf_counter() - start
+
+def load_record(sweep_dir, num_episodes):
+    # The completed jobs, after cutting off whatever an interrupted run wrote
+    # past the last complete record: a partial line of jobs.jsonl, or steps of
+    # a job whose record was never written
+    jobs_file = os.path.join(sweep_dir, "jobs.jsonl")
+    steps_file = os.path.join(sweep_dir, "steps.bin")
+    record = []
+    size = 0
+    if os.path.exists(jobs_file):
+        with open(jobs_file, "rb") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                if not line.endswith(b"\n"):
+                    break
+                record.append(entry)
+                size += len(line)
+        os.truncate(jobs_file, size)
+    if os.path.exists(steps_file):
+        os.truncate(steps_file, len(record) * num_episodes * 4)
+    return record
+
+def check_settings(sweep_dir, num_episodes):
+    # A sweep directory belongs to one number of episodes, since every job
+    # writes a steps row of that length
+    settings_file = os.path.join(sweep_dir, "sweep.json")
+    if os.path.exists(settings_file):
+        with open(settings_file) as f:
+            settings = json.load(f)
+        if settings["episodes"] != num_episodes:
+            raise ValueError(f"{sweep_dir} holds a sweep of {settings['episodes']} episodes, not {num_episodes}")
+    else:
+        with open(settings_file, "w") as f:
+            json.dump({"episodes": num_episodes}, f)
+
+def gather(sweep_dir, num_episodes):
+    # Write results.npz from the completed jobs and return its path
+    record = load_record(sweep_dir, num_episodes)
+    steps_file = os.path.join(sweep_dir, "steps.bin")
+    if record:
+        steps = np.fromfile(steps_file, dtype=np.int32).reshape(len(record), num_episodes)
+    else:
+        steps = np.zeros((0, num_episodes), dtype=np.int32)
+    results = {name: np.array([entry["job"][i] for entry in record]) for i, name in enumerate(columns)}
+    results["seconds"] = np.array([entry["seconds"] for entry in record], dtype=float)
+    results["steps"] = steps
+    out_file = os.path.join(sweep_dir, "results.npz")
+    np.savez(out_file, **results)
+    return out_file
+
+def sweep(jobs, num_episodes, sweep_dir, processes=None):
+    os.makedirs(sweep_dir, exist_ok=True)
+    check_settings(sweep_dir, num_episodes)
+    done = {tuple(entry["job"]) for entry in load_record(sweep_dir, num_episodes)}
+    pending = [job for job in jobs if job not in done]
+    print(f"{len(jobs)} jobs, {len(jobs) - len(pending)} already completed in {sweep_dir}")
+
+    with open(os.path.join(sweep_dir, "steps.bin"), "ab") as steps_file, \
+            open(os.path.join(sweep_dir, "jobs.jsonl"), "a") as jobs_file, \
+            multiprocessing.Pool(processes) as pool:
+        for count, (job, steps, seconds) in enumerate(
+                pool.imap_unordered(partial(run_job, num_episodes=num_episodes), pending), 1):
+            # The steps go first, so that a job is only in the record once
+            # its steps are on disk
+            steps_file.write(steps.tobytes())
+            steps_file.flush()
+            jobs_file.write(json.dumps({"job": list(job), "seconds": seconds}) + "\n")
+            jobs_file.flush()
+            tail = steps[-max(1, num_episodes // 10):].mean()
+            print(f"[{count}/{len(pending)}] {' '.join(map(str, job))}: "
+                  f"{tail:.1f} steps per episode at the end, {seconds:.2f} s")
+
+    return gather(sweep_dir, num_episodes)
+
+def split(text, kind=str):
+    return [kind(x) for x in text.split(",")]
+
+def main():
+    parser = argparse.ArgumentParser(description="Hyperparameter sweep of the windy gridworld TD agents")
+    parser.add_argument("--algorithms", type=str, default="sarsa,expected_sarsa,q_learning")
+    parser.add_argument("--alphas", type=str, default="0.1,0.3,0.5")
+    parser.add_argument("--epsilons", type=str, default="0.05,0.1,0.2")
+    parser.add_argument("--gammas", type=str, default="1.0")
+    parser.add_argument("--winds", type=str, default="steady,stochastic", help="steady and/or stochastic")
+    parser.add_argument("--moves", type=str, default="kings,four", help="kings and/or four")
+    parser.add_argument("--seeds", type=int, default=10, help="runs of every setting, seeded 0 to seeds - 1")
+    parser.add_argument("--episodes", type=int, default=200)
+    parser.add_argument("--processes", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--dir", type=str, default="td_sweep", help="sweep directory, reused to resume")
+    args = parser.parse_args()
+
+    algorithms = split(args.algorithms)
+    for algorithm in algorithms:
+        if algorithm not in agents:
+            parser.error(f"unknown algorithm {algorithm}, expected one of {', '.join(agents)}")
+    winds, moves = split(args.winds), split(args.moves)
+    if not set(winds) <= {"steady", "stochastic"}:
+        parser.error("--winds takes steady and/or stochastic")
+    if not set(moves) <= {"kings", "four"}:
+        parser.error("--moves takes kings and/or four")
+
+    jobs = list(itertools.product(algorithms, split(args.alphas, float), split(args.epsilons, float),
+                                  split(args.gammas, float), winds, moves, range(args.seeds)))
+    start = time.perf_counter()
+    out_file = sweep(jobs, args.episodes, args.dir, args.processes)
+    print(f"results in {out_file} ({time.perf_counter() - start:.1f} s)")
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,8 @@
 import numpy as np
 import random
-import matplotlib.pyplot as plt
 
 class WindyGridworld:
-    def __init__(self, rows, cols, wind_strength):
+    def __init__(self, rows, cols, wind_strength, stochastic_wind=False, king_moves=True):
         self.rows = rows
         self.cols = cols
         self.wind_strength = wind_strength
@@ -12,9 +11,39 @@ class WindyGridworld:
         self.goal_state = (3, 7)
 
         self.actions = [(0, 1), (0, -1), (1, 0), (-1, 0), (-1, 1), (-1, -1), (1, 1), (1, -1)]
+        if not king_moves:
+            # Only the four moves up, down, left and right
+            self.actions = self.actions[:4]
+
+        # With stochastic wind, the wind of a windy column pushes one row
+        # more or one row less than its strength a third of the time each.
+        # These are the equally likely extra rows.
+        self.stochastic_wind = stochastic_wind
+        self.wind_noise = [0, 1, -1] if stochastic_wind else [0]
+
+        # Integer-encoded states (row * cols + col) and the actions and wind
+        # as arrays
+        self.num_states = rows * cols
+        self.start_index = self.state_index(self.start_state)
+        self.goal_index = self.state_index(self.goal_state)
+        self.action_offsets = np.array(self.actions)
+        self.wind = np.array(wind_strength)
+
+        # Next state and reward of every (wind noise, state, action), built
+        # once. The agents step with the nested list copies, which are faster
+        # to index one element at a time than NumPy arrays.
+        self.next_table, self.reward_table = self.transition_table()
+        self.next_list, self.reward_list = self.next_table.tolist(), self.reward_table.tolist()
+
+    def state_index(self, state):
+        return state[0] * self.cols + state[1]
 
     def step(self, state, action):
-        next_state = (state[0] + action[0], state[1] + action[1] + self.wind_strength[state[1]])
+        # The wind of the current column pushes the agent up that many rows
+        wind = self.wind_strength[state[1]]
+        if wind and self.stochastic_wind:
+            wind += random.choice(self.wind_noise)
+        next_state = (state[0] + action[0] - wind, state[1] + action[1])
         next_state = (max(0, min(self.rows - 1, next_state[0])),
                       max(0, min(self.cols - 1, next_state[1])))
 
@@ -24,23 +53,64 @@ class WindyGridworld:
 
         return next_state, reward
 
+    def step_batch(self, states, actions, noise=0):
+        # step() for arrays of integer-encoded states and action indices,
+        # with the wind noise given instead of drawn
+        row, col = np.divmod(states, self.cols)
+        wind = self.wind[col]
+        wind = wind + np.where(wind > 0, noise, 0)
+        next_row = np.clip(row + self.action_offsets[actions, 0] - wind, 0, self.rows - 1)
+        next_col = np.clip(col + self.action_offsets[actions, 1], 0, self.cols - 1)
+        next_states = next_row * self.cols + next_col
+        rewards = np.where(next_states == self.goal_index, 0.0, -1.0)
+        return next_states, rewards
+
+    def transition_table(self):
+        # Next state and reward of every (wind noise, state, action), shape
+        # (len(wind_noise), num_states, num_actions)
+        num_actions = len(self.actions)
+        states = np.repeat(np.arange(self.num_states), num_actions)
+        actions = np.tile(np.arange(num_actions), self.num_states)
+        tables = [self.step_batch(states, actions, noise) for noise in self.wind_noise]
+        shape = (len(self.wind_noise), self.num_states, num_actions)
+        return (np.stack([next_states for next_states, _ in tables]).reshape(shape),
+                np.stack([rewards for _, rewards in tables]).reshape(shape))
+
+    def step_index(self, state, action):
+        # step() for an integer-encoded state and an action index
+        k = random.randrange(len(self.wind_noise)) if self.stochastic_wind else 0
+        return self.next_list[k][state][action], self.reward_list[k][state][action]
+
+def new_q_table(agent):
+    # One list of action values per integer state
+    return [[0.0] * len(agent.actions) for _ in range(agent.num_states)]
+
+def q_array(agent, Q):
+    # The Q-table as an array of shape (rows, cols, actions)
+    return np.array(Q).reshape(agent.rows, agent.cols, len(agent.actions))
+
 def epsilon_greedy_action(Q, state, epsilon):
+    values = Q[state]
     if random.random() < epsilon:
-        return random.choice(range(len(Q[state])))
+        return random.randrange(len(values))
     else:
-        return np.argmax(Q[state])
+        # The first of the best actions, like np.argmax
+        return values.index(max(values))
 
 def sarsa_zero(agent, num_episodes, alpha, epsilon, gamma):
-    Q = np.zeros((agent.rows, agent.cols, len(agent.actions)))
+    Q = new_q_table(agent)
+    next_list, reward_list = agent.next_list, agent.reward_list
+    outcomes = len(agent.wind_noise)
     episode_steps = []
 
     for _ in range(num_episodes):
-        state = agent.start_state
+        state = agent.start_index
         action = epsilon_greedy_action(Q, state, epsilon)
         steps = 0
 
-        while state != agent.goal_state:
-            next_state, reward = agent.step(state, agent.actions[action])
+        while state != agent.goal_index:
+            k = random.randrange(outcomes) if outcomes > 1 else 0
+            next_state, reward = next_list[k][state][action], reward_list[k][state][action]
             next_action = epsilon_greedy_action(Q, next_state, epsilon)
             Q[state][action] += alpha * (reward + gamma * Q[next_state][next_action] - Q[state][action])
 
@@ -50,19 +120,22 @@ def sarsa_zero(agent, num_episodes, alpha, epsilon, gamma):
 
         episode_steps.append(steps)
 
-    return episode_steps, Q
+    return episode_steps, q_array(agent, Q)
 
 def expected_sarsa(agent, num_episodes, alpha, epsilon, gamma):
-    Q = np.zeros((agent.rows, agent.cols, len(agent.actions)))
+    Q = new_q_table(agent)
+    next_list, reward_list = agent.next_list, agent.reward_list
+    outcomes = len(agent.wind_noise)
     episode_steps = []
 
     for _ in range(num_episodes):
-        state = agent.start_state
+        state = agent.start_index
         steps = 0
 
-        while state != agent.goal_state:
+        while state != agent.goal_index:
             action = epsilon_greedy_action(Q, state, epsilon)
-            next_state, reward = agent.step(state, agent.actions[action])
+            k = random.randrange(outcomes) if outcomes > 1 else 0
+            next_state, reward = next_list[k][state][action], reward_list[k][state][action]
 
             expected_value = sum(Q[next_state]) / len(Q[next_state])
             Q[state][action] += alpha * (reward + gamma * expected_value - Q[state][action])
@@ -72,19 +145,22 @@ def expected_sarsa(agent, num_episodes, alpha, epsilon, gamma):
 
         episode_steps.append(steps)
 
-    return episode_steps, Q
+    return episode_steps, q_array(agent, Q)
 
 def q_learning(agent, num_episodes, alpha, epsilon, gamma):
-    Q = np.zeros((agent.rows, agent.cols, len(agent.actions)))
+    Q = new_q_table(agent)
+    next_list, reward_list = agent.next_list, agent.reward_list
+    outcomes = len(agent.wind_noise)
     episode_steps = []
 
     for _ in range(num_episodes):
-        state = agent.start_state
+        state = agent.start_index
         steps = 0
 
-        while state != agent.goal_state:
+        while state != agent.goal_index:
             action = epsilon_greedy_action(Q, state, epsilon)
-            next_state, reward = agent.step(state, agent.actions[action])
+            k = random.randrange(outcomes) if outcomes > 1 else 0
+            next_state, reward = next_list[k][state][action], reward_list[k][state][action]
 
             max_next_value = max(Q[next_state])
             Q[state][action] += alpha * (reward + gamma * max_next_value - Q[state][action])
@@ -94,9 +170,99 @@ def q_learning(agent, num_episodes, alpha, epsilon, gamma):
 
         episode_steps.append(steps)
 
-    return episode_steps, Q
+    return episode_steps, q_array(agent, Q)
+
+td_methods = ["sarsa", "expected_sarsa", "q_learning"]
+
+def td_batch(agent, methods, num_runs, num_episodes, alpha, epsilon, gamma, rng=None, block=1024):
+    # Runs num_runs independent copies of each of sarsa_zero, expected_sarsa
+    # and q_learning named in methods (see td_methods) in lockstep. Every
+    # iteration takes one step in all runs at once, with integer states, a
+    # precomputed transition table and the Q-tables of all runs in a single
+    # array. Returns the steps of every episode, shape
+    # (len(methods), num_runs, num_episodes), and the Q-tables, shape
+    # (len(methods), num_runs, rows, cols, actions).
+    rng = rng if rng is not None else np.random.default_rng()
+    num_actions = len(agent.actions)
+    outcomes = len(agent.wind_noise)
+    next_table = agent.next_table.reshape(outcomes, -1)
+    reward_table = agent.reward_table.reshape(outcomes, -1)
+    # Reaching the goal ends the episode: the target is just the reward and
+    # the run moves back to the start state
+    done_table = next_table == agent.goal_index
+    gamma_table = np.where(done_table, 0.0, gamma)
+    next_table = np.where(done_table, agent.start_index, next_table)
+
+    method = np.repeat([td_methods.index(m) for m in methods], num_runs)
+    sarsa, expected = method == 0, method == 1
+    any_expected = expected.any()
+    uniform = np.full(num_actions, 1.0 / num_actions)
+    n = len(method)
+    runs = np.arange(n)
+    # Row of Q holding state s of run i: first_row[i] + s
+    first_row = runs * agent.num_states
+    Q = np.zeros((n * agent.num_states, num_actions))
+    Q_flat = Q.ravel()
+    episode = np.zeros(n, dtype=np.int64)
+    learning = alpha * np.ones(n)
+    episode_ends = []
+
+    state = np.full(n, agent.start_index)
+    # Sarsa's next action, chosen before its update
+    sarsa_action = np.where(rng.random(n) < epsilon, rng.integers(num_actions, size=n),
+                            Q[first_row + state].argmax(axis=1))
+    t = 0
+    while learning.any():
+        if t % block == 0:
+            # Random numbers are drawn a block of steps at a time
+            explore_block = rng.random((block, n)) < epsilon
+            random_block = rng.integers(num_actions, size=(block, n))
+            if outcomes > 1:
+                noise_block = rng.integers(outcomes, size=(block, n))
+        explore, random_action = explore_block[t % block], random_block[t % block]
+        # Which wind noise each run gets this step
+        k = noise_block[t % block] if outcomes > 1 else 0
+
+        row = first_row + state
+        action = np.where(sarsa, sarsa_action,
+                          np.where(explore, random_action, Q[row].argmax(axis=1)))
+        transition = state * num_actions + action
+        next_state = next_table[k, transition]
+        next_q = Q[first_row + next_state]
+        greedy = next_q.argmax(axis=1)
+        sarsa_action = np.where(explore, random_action, greedy)
+        # Sarsa bootstraps from its next action, Q-learning from the greedy
+        # one and Expected Sarsa from the mean over actions
+        target = next_q[runs, np.where(sarsa, sarsa_action, greedy)]
+        if any_expected:
+            target = np.where(expected, next_q @ uniform, target)
+        cell = row * num_actions + action
+        q_sa = Q_flat[cell]
+        Q_flat[cell] = q_sa + learning * (reward_table[k, transition] + gamma_table[k, transition] * target - q_sa)
+
+        done = done_table[k, transition]
+        if done.any():
+            # Runs stop learning once they have finished all their episodes
+            finished = np.flatnonzero(done & (learning > 0))
+            episode_ends.append((np.full(len(finished), t), finished))
+            episode[finished] += 1
+            learning[finished[episode[finished] == num_episodes]] = 0.0
+        state = next_state
+        t += 1
+
+    # Every run takes one step per iteration, so an episode ending at
+    # iteration t ends after t + 1 steps of its run
+    ends, ended_runs = (np.concatenate(x) for x in zip(*episode_ends))
+    ends = ends[np.argsort(ended_runs, kind="stable")].reshape(n, num_episodes) + 1
+    episode_steps = np.diff(ends, axis=1, prepend=0)
+
+    shape = (len(methods), num_runs)
+    return episode_steps.reshape(shape + (num_episodes,)), Q.reshape(shape + (agent.rows, agent.cols, num_actions))
 
 def plot_episodes_vs_steps(episodes_vs_steps_sarsa, episodes_vs_steps_exp_sarsa, episodes_vs_steps_q_learning):
+    # Imported here so that td_sweep.py workers do not load matplotlib
+    import matplotlib.pyplot as plt
+
     plt.figure(figsize=(10, 6))
     plt.plot(range(len(episodes_vs_steps_sarsa)), episodes_vs_steps_sarsa, label='Sarsa(0)')
     plt.plot(range(len(episodes_vs_steps_exp_sarsa)), episodes_vs_steps_exp_sarsa, label='Expected Sarsa')
@@ -121,22 +287,10 @@ if __name__ == "__main__":
     gamma = 1.0
 
     num_runs = 10
-    episodes_vs_steps_sarsa = []
-    episodes_vs_steps_exp_sarsa = []
-    episodes_vs_steps_q_learning = []
-
-    for _ in range(num_runs):
-        steps_sarsa, _ = sarsa_zero(agent, num_episodes, alpha, epsilon, gamma)
-        episodes_vs_steps_sarsa.append(steps_sarsa)
-
-        steps_exp_sarsa, _ = expected_sarsa(agent, num_episodes, alpha, epsilon, gamma)
-        episodes_vs_steps_exp_sarsa.append(steps_exp_sarsa)
-
-        steps_q_learning, _ = q_learning(agent, num_episodes, alpha, epsilon, gamma)
-        episodes_vs_steps_q_learning.append(steps_q_learning)
-
-    episodes_vs_steps_sarsa_avg = np.mean(episodes_vs_steps_sarsa, axis=0)
-    episodes_vs_steps_exp_sarsa_avg = np.mean(episodes_vs_steps_exp_sarsa, axis=0)
-    episodes_vs_steps_q_learning_avg = np.mean(episodes_vs_steps_q_learning, axis=0)
+    # All runs of the three agents are simulated together by td_batch;
+    # sarsa_zero, expected_sarsa and q_learning run a single agent at a time
+    episodes_vs_steps, _ = td_batch(agent, td_methods, num_runs, num_episodes, alpha, epsilon, gamma)
+    episodes_vs_steps_sarsa_avg, episodes_vs_steps_exp_sarsa_avg, episodes_vs_steps_q_learning_avg = \
+        episodes_vs_steps.mean(axis=1)
 
     plot_episodes_vs_steps(episodes_vs_steps_sarsa_avg, episodes_vs_steps_exp_sarsa_avg, episodes_vs_steps_q_learning_avg)
\ No newline at end of file